@@ -5,6 +5,10 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 from datetime import datetime
+from rollups import bucket_start
+from dashboard_data import EXPORT_MAX_ROWS, export_logs, log_count, log_page, rollup_series, sync_rollups
+from jobs import JobManager, QUEUED, RUNNING
+from metrics import EXPORT_INTERVAL, read_latest
 
 # Constants
 TOWNS = [
@@ -22,17 +26,83 @@ st.set_page_config(
     initial_sidebar_state='expanded'
 )
 
-# Sidebar navigation
-page = st.sidebar.radio('Go to', ['Home', 'Dashboard'])
+@st.cache_resource
+def get_jobs():
+    # one job pool per Streamlit server, shared by every session and rerun
+    return JobManager(workers=2, snapshot_dir=SNAPSHOT_DIR, detailed_csv=CSV_PATH)
+
+
+@st.fragment(run_every=1.0)
+def show_jobs():
+    jobs = get_jobs()
+    for job in jobs.jobs():
+        c1, c2, c3 = st.columns([3,4,1])
+        c1.markdown(f"**{job['name']}** — {job['location']}  \n`{job['state']}`")
+        if job['state'] in (QUEUED, RUNNING):
+            done = job['frames'] / job['total_frames'] if job['total_frames'] else 0.0
+            c2.progress(min(done, 1.0), text=(
+                f"{job['frames']}/{job['total_frames']} frames · {job['fps']:.1f} fps · "
+                f"{job['violations']} violations"
+            ))
+            if c3.button('Cancel', key=f"cancel_{job['id']}"):
+                jobs.cancel(job['id'])
+        elif job['error']:
+            c2.error(job['error'])
+        else:
+            c2.write(f"{job['cars_passed']} cars passed, {job['violations']} violations")
+
+@st.fragment(run_every=2.0)
+def show_operations(town: str):
+    now = datetime.now().timestamp()
+    snaps = [s for s in read_latest() if town == 'National' or s['location'] == town]
+    running = [s for s in snaps if s['state'] == 'running']
+    if not snaps:
+        st.info('No analyses have reported metrics yet.')
+        return
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric('Running analyses', len(running))
+    c2.metric('Frames/s (running)', f"{sum(s['fps'] for s in running):.1f}")
+    c3.metric('Violations/min (running)', f"{sum(s['violations_per_minute'] for s in running):.2f}")
+    c4.metric('Dropped frames', sum(s['gauges'].get('dropped_frames', 0) for s in running))
+
+    rows = []
+    for s in snaps:
+        state = s['state']
+        if state == 'running' and now - s['timestamp'] > 3 * EXPORT_INTERVAL:
+            state = 'stale'
+        rows.append({
+            'town': s['location'],
+            'camera': s['camera'],
+            'state': state,
+            'frames': s['frames'],
+            'fps': s['fps'],
+            'p50 ms': s['latency_ms']['p50'],
+            'p99 ms': s['latency_ms']['p99'],
+            'violations/min': s['violations_per_minute'],
+            'violations': s['counters'].get('violations', 0),
+            'dropped frames': s['gauges'].get('dropped_frames', 0),
+            'queue depths': ' / '.join(map(str, s['queue_depths'])),
+            'updated': datetime.fromtimestamp(s['timestamp']).strftime('%H:%M:%S'),
+        })
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+    st.subheader('Time per Frame by Stage')
+    stages = pd.DataFrame([
+        {'camera': f"{s['location']} · {s['camera']}", 'stage': stage, 'ms': st_['ms_per_frame']}
+        for s in (running or snaps) for stage, st_ in s['stages'].items()
+    ])
+    if not stages.empty:
+        chart = alt.Chart(stages).mark_bar().encode(
+            x=alt.X('sum(ms):Q', title='ms per frame'),
+            y=alt.Y('camera:N', title=None),
+            color=alt.Color('stage:N', title='Stage'),
+            tooltip=['camera', 'stage', 'ms'],
+        )
+        st.altair_chart(chart, use_container_width=True)
 
-# Common styles
-def load_data():
-    # Read CSV with correct column names (including city)
-    cols = ['timestamp','city','plate','light_color','snapshot']
-    df = pd.read_csv(CSV_PATH, names=cols, header=0)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-    df['week'] = df['timestamp'].dt.to_period('W').apply(lambda r: r.start_time)
-    return df
+# Sidebar navigation
+page = st.sidebar.radio('Go to', ['Home', 'Dashboard', 'Operations'])
 
 if page == 'Home':
     st.title('🚦 Video Analysis')
@@ -52,14 +122,12 @@ if page == 'Home':
         if not video_file:
             st.error('Please upload a video.')
         else:
-            st.info(f'Analyzing **{location}** video...')
-            # TODO: integrate real analysis
-            progress = st.progress(0)
-            for i in range(1, 101):
-                progress.progress(i)
-            st.success('✅ Analysis complete!')
-            st.balloons()
-            st.markdown('Switch to **Dashboard** to see results.')
+            get_jobs().submit(video_file, video_file.name, location)
+            st.success(f'Queued **{location}** video for analysis.')
+            st.markdown('Results appear on the **Dashboard** as jobs finish.')
+
+    st.subheader('Analysis Jobs')
+    show_jobs()
 
 elif page == 'Dashboard':
     st.title('📊 Violation Analytics')
@@ -67,31 +135,35 @@ elif page == 'Dashboard':
         st.warning('No data found. Run analysis first on the Home page.')
         st.stop()
 
-    df = load_data()
+    # Charts are served from the rollups; raw rows only feed the log table
+    sync_rollups('violations', CSV_PATH)
+    daily_all = rollup_series('violations', 'day')
+    if daily_all.empty:
+        st.warning('No data found. Run analysis first on the Home page.')
+        st.stop()
+
     # Filters
     col1, col2 = st.columns([2,3])
     with col1:
         selected_town = st.selectbox('Filter by Town', ['National'] + TOWNS)
         date_range = st.date_input(
             'Date Range',
-            [df['timestamp'].min().date(), df['timestamp'].max().date()]
+            [daily_all['bucket'].min().date(), daily_all['bucket'].max().date()]
         )
-    # Apply filters
-    mask = (df['timestamp'].dt.date >= date_range[0]) & (df['timestamp'].dt.date <= date_range[1])
-    if selected_town != 'National':
-        mask &= (df['city'] == selected_town)
-    data = df.loc[mask]
+    town_filter = None if selected_town == 'National' else [selected_town]
+    daily = rollup_series('violations', 'day', town_filter, date_range[0], date_range[1])
+    weekly = (daily.assign(week=bucket_start(daily['bucket'], 'week'))
+                   .groupby('week')['violations'].sum().reset_index(name='count'))
 
     # KPI cards
-    total = len(data)
-    avg_week = data.groupby('week').size().mean() if total else 0
+    total = int(weekly['count'].sum())
+    avg_week = weekly['count'].mean() if total else 0
     col3, col4, _ = st.columns([1,1,2])
     col3.metric('Total Violations', total)
     col4.metric('Avg per Week', f"{avg_week:.1f}")
 
     # Weekly Trend
     st.subheader('Weekly Trend')
-    weekly = data.groupby('week').size().reset_index(name='count')
     brush = alt.selection(type='interval', encodings=['x'])
     base = alt.Chart(weekly).encode(
         x=alt.X('week:T', title='Week'),
@@ -103,9 +175,8 @@ elif page == 'Dashboard':
 
     # Heatmap by Town
     st.subheader('Weekly Violations by Town')
-    heat_data = df.groupby(['week','city']).size().reset_index(name='count')
-    if selected_town != 'National':
-        heat_data = heat_data[heat_data['city'] == selected_town]
+    heat_data = (rollup_series('violations', 'week', town_filter)
+                        .rename(columns={'bucket': 'week', 'violations': 'count'}))
     heat = alt.Chart(heat_data).mark_rect().encode(
         x=alt.X('week:T', title='Week'),
         y=alt.Y('city:N', title='Town'),
@@ -113,10 +184,37 @@ elif page == 'Dashboard':
     ).properties(height=400)
     st.altair_chart(heat, use_container_width=True)
 
-    # Detailed Table
+    # Detailed Table: paged, sorted and searched inside the SQLite log index
     st.subheader('Detailed Logs')
-    st.dataframe(data[['timestamp','city','plate','light_color','snapshot']].sort_values('timestamp', ascending=False))
+    log_town = None if selected_town == 'National' else selected_town
+    c1, c2, c3, c4 = st.columns([2,1,1,1])
+    plate_prefix = c1.text_input('Plate starts with').strip()
+    sort_by = c2.selectbox('Sort by', ['timestamp', 'city', 'plate'])
+    descending = c3.selectbox('Order', ['Descending', 'Ascending']) == 'Descending'
+    page_size = c4.selectbox('Rows per page', [50, 100, 250, 500], index=1)
+    total = log_count(CSV_PATH, log_town, date_range[0], date_range[1], plate_prefix)
+    pages = max(-(-total // page_size), 1)
+    page_no = st.number_input(f'Page (of {pages})', min_value=1, max_value=pages, value=1)
+    st.dataframe(
+        log_page(CSV_PATH, log_town, date_range[0], date_range[1], plate_prefix,
+                 sort_by, descending, page_no - 1, page_size),
+        use_container_width=True, hide_index=True,
+    )
+    st.caption(f'{total:,} matching violations')
+
+    # Download CSV: built only in the run the button is pressed, never kept
+    # in session state, and capped so one download can't hold the whole log
+    export_rows = min(total, EXPORT_MAX_ROWS)
+    if st.button(f'Prepare CSV Export ({export_rows:,} rows)'):
+        st.download_button('Download Data',
+                           export_logs(CSV_PATH, log_town, date_range[0], date_range[1], plate_prefix),
+                           file_name='filtered_violations.csv', mime='text/csv')
+    if total > EXPORT_MAX_ROWS:
+        st.caption(f'Downloads stop at the oldest {EXPORT_MAX_ROWS:,} matching rows; '
+                   'narrow the filters, or export from the desktop Violation Logs window.')
 
-    # Download CSV
-    csv = data.to_csv(index=False)
-    st.download_button('Download Data', csv, file_name='filtered_violations.csv')
+elif page == 'Operations':
+    st.title('🛠️ Operations')
+    st.markdown('Live pipeline health of running analyses, per camera and town.')
+    ops_town = st.selectbox('Town', ['National'] + TOWNS)
+    show_operations(ops_town)
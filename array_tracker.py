@@ -0,0 +1,177 @@
+# array_tracker.py
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # fall back to greedy matching on the same cost matrix
+    linear_sum_assignment = None
+
+_INVALID = 1e6
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N,4) and (M,4) xyxy boxes as an (N,M) array."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _greedy(cost: np.ndarray, max_cost: float):
+    rows, cols = [], []
+    used_r, used_c = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        r, c = divmod(int(flat), cost.shape[1])
+        if cost[r, c] >= max_cost:
+            break
+        if r in used_r or c in used_c:
+            continue
+        rows.append(r)
+        cols.append(c)
+        used_r.add(r)
+        used_c.add(c)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+def _optimal(cost: np.ndarray, max_cost: float):
+    """
+    Optimal assignment in which any track or detection may stay unmatched.
+    Each row and column gets its own dummy partner at half of `max_cost`,
+    so a pair is only chosen when it is cheaper than leaving both sides
+    unmatched.
+    """
+    n, m = cost.shape
+    padded = np.full((n + m, m + n), _INVALID)
+    padded[:n, :m] = cost
+    padded[np.arange(n), m + np.arange(n)] = max_cost / 2
+    padded[n + np.arange(m), np.arange(m)] = max_cost / 2
+    padded[n:, m:] = 0.0
+    rows, cols = linear_sum_assignment(padded)
+    real = (rows < n) & (cols < m)
+    rows, cols = rows[real], cols[real]
+    keep = cost[rows, cols] < max_cost
+    return rows[keep], cols[keep]
+
+
+class ArrayTracker:
+    """
+    Vehicle tracker with the same interface as CentroidTracker:
+    `update(boxes)` returns {object_id: (cx, cy)} for every live track.
+
+    Track state lives in NumPy arrays. Each track's box is first moved
+    along its constant-velocity estimate to the current frame; one cost
+    matrix then mixes (1 - IoU) and normalised centroid distance against
+    those predictions, gates pairs with no overlap that are further apart
+    than `max_distance` per frame since the previous update (up to
+    `max_gap` frames), and is solved with optimal assignment. With frame
+    indices passed to `update`, a detection stride widens the gate
+    accordingly. Pairs costing `max_cost` or more are never matched, so a
+    lingering track cannot take a far-off detection that belongs to a new
+    vehicle; and given the frame size, tracks predicted to have left the
+    frame stop competing for detections altogether.
+
+    Tracks unseen for more than `max_disappeared` updates are dropped;
+    their ids are listed in `evicted` after the update so callers can
+    release per-track state too.
+    """
+    def __init__(self, max_disappeared: int = 40, max_distance: float = 150.0,
+                 iou_weight: float = 0.5, max_gap: int = 10, max_cost: float = 0.8):
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        self.iou_weight = iou_weight
+        self.max_gap = max_gap
+        self.max_cost = max_cost
+        self.next_id = 0
+        self.frame_idx = -1
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=float)
+        self.vel = np.empty((0, 2), dtype=float)
+        self.seen_at = np.empty(0, dtype=np.int64)
+        self.missed = np.empty(0, dtype=np.int64)
+        self.evicted: list[int] = []
+
+    @staticmethod
+    def _centroids(boxes):
+        return np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2))
+
+    def _cost(self, predicted, gate, dets):
+        iou = iou_matrix(predicted, dets)
+        diff = self._centroids(predicted)[:, None, :] - self._centroids(dets)[None, :, :]
+        dist = np.sqrt((diff ** 2).sum(axis=2))
+        gate = gate[:, None]
+        cost = (self.iou_weight * (1.0 - iou)
+                + (1.0 - self.iou_weight) * np.minimum(dist / gate, 1.0))
+        cost[(dist > gate) & (iou <= 0)] = _INVALID
+        return cost
+
+    def update(self, boxes, frame_idx: int | None = None,
+               frame_shape: tuple[int, int] | None = None) -> dict[int, tuple[int, int]]:
+        """
+        Matches `boxes` (xyxy) to the live tracks. `frame_idx` is the frame
+        they were detected on; without it every update counts as one frame.
+        `frame_shape` is (height, width); tracks whose predicted centroid
+        falls outside it are not matched.
+        """
+        step = 1 if frame_idx is None or self.frame_idx < 0 else frame_idx - self.frame_idx
+        self.frame_idx = self.frame_idx + 1 if frame_idx is None else frame_idx
+        dets = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        matched_t = np.zeros(len(self.ids), dtype=bool)
+        matched_d = np.zeros(len(dets), dtype=bool)
+
+        if len(self.ids) and len(dets):
+            gap = np.maximum(self.frame_idx - self.seen_at, 1)
+            predicted = self.boxes + np.tile(self.vel * gap[:, None], 2)
+            gate = np.full(len(self.ids), self.max_distance * min(max(step, 1), self.max_gap))
+            cost = self._cost(predicted, gate, dets)
+            if frame_shape is not None:
+                h, w = frame_shape[:2]
+                cx, cy = self._centroids(predicted).T
+                cost[(cx < 0) | (cx >= w) | (cy < 0) | (cy >= h)] = _INVALID
+            solve = _optimal if linear_sum_assignment is not None else _greedy
+            rows, cols = solve(cost, self.max_cost)
+            elapsed = np.maximum(self.frame_idx - self.seen_at[rows], 1)[:, None]
+            self.vel[rows] = (self._centroids(dets[cols]) - self._centroids(self.boxes[rows])) / elapsed
+            self.boxes[rows] = dets[cols]
+            self.seen_at[rows] = self.frame_idx
+            self.missed[rows] = 0
+            matched_t[rows] = True
+            matched_d[cols] = True
+
+        self.missed[~matched_t] += 1
+        alive = self.missed <= self.max_disappeared
+        self.evicted = self.ids[~alive].tolist()
+        self.ids, self.boxes, self.missed = self.ids[alive], self.boxes[alive], self.missed[alive]
+        self.vel, self.seen_at = self.vel[alive], self.seen_at[alive]
+
+        new = dets[~matched_d]
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int64)
+            self.next_id += len(new)
+            self.ids = np.concatenate((self.ids, new_ids))
+            self.boxes = np.concatenate((self.boxes, new))
+            self.vel = np.concatenate((self.vel, np.zeros((len(new), 2))))
+            self.seen_at = np.concatenate((self.seen_at, np.full(len(new), self.frame_idx, dtype=np.int64)))
+            self.missed = np.concatenate((self.missed, np.zeros(len(new), dtype=np.int64)))
+
+        cents = self._centroids(self.boxes).astype(int)
+        return {int(i): (int(cx), int(cy)) for i, (cx, cy) in zip(self.ids, cents)}
+
+    def predicted_boxes(self) -> dict[int, tuple[int, int, int, int]]:
+        """
+        Boxes of every live track at the last update: the detected box for
+        matched tracks, the box moved along its velocity for the others.
+        """
+        gap = (self.frame_idx - self.seen_at)[:, None]
+        boxes = self.boxes + np.tile(self.vel * gap, 2)
+        return {int(i): tuple(b) for i, b in zip(self.ids, boxes.astype(int).tolist())}
+
+    def current_boxes(self) -> dict[int, tuple[int, int, int, int]]:
+        """Boxes of the tracks matched to a detection in the last update."""
+        seen = self.missed == 0
+        return {int(i): tuple(b) for i, b in zip(self.ids[seen], self.boxes[seen].astype(int).tolist())}
@@ -0,0 +1,216 @@
+# batch_runner.py
+"""
+Runs analyze_video over many videos on a process pool.
+Each worker loads the vehicle and plate models once and is capped to a
+fixed number of intra-op threads so workers don't oversubscribe cores.
+
+Usage:
+    python batch_runner.py videos/ --location Harare --workers 4
+    python batch_runner.py manifest.csv --workers 4   # columns: video,location
+"""
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv')
+BATCH_SUMMARY_FIELDS = ['timestamp', 'video', 'location', 'cars_passed',
+                        'violations', 'seconds', 'error']
+BATCH_TOTALS_FIELDS = ['timestamp', 'location', 'videos', 'failed', 'cars_passed',
+                       'violations', 'seconds']
+
+def limit_threads(n: int):
+    """
+    Caps BLAS/OpenMP, OpenCV and torch intra-op threads at `n`.
+    Must run before torch is imported to take full effect.
+    """
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(n)
+    import cv2
+    cv2.setNumThreads(n)
+    import torch
+    torch.set_num_threads(n)
+
+
+def init_worker(threads: int, plate_weights: str | None):
+    """
+    Process-pool initializer for analysis workers: limits each worker to
+    `threads` threads and loads the vehicle and plate models once.
+    """
+    limit_threads(threads)
+    # load and warm up both models once; analyze_video reuses them
+    import model_registry
+    model_registry.preload(model_registry.VEHICLE_WEIGHTS,
+                           plate_weights or model_registry.PLATE_WEIGHTS)
+
+
+def _plate_model(plate_weights: str | None):
+    import model_registry
+    return model_registry.get_model(plate_weights or model_registry.PLATE_WEIGHTS)
+
+
+def _run_one(job: dict, options: dict, plate_weights: str | None = None) -> dict:
+    from download_weight import analyze_video
+    import metrics
+    metrics.start_exporters()
+    start = time.perf_counter()
+    result = dict(video=job['video'], location=job['location'],
+                  cars_passed=0, violations=0, error='')
+    try:
+        with metrics.Metrics(job['location'], camera=os.path.basename(job['video'])) as m:
+            result['cars_passed'], result['violations'] = analyze_video(
+                job['video'], job['location'], plate_model=_plate_model(plate_weights),
+                timer=m, **options
+            )
+    except Exception as exc:
+        result['error'] = f'{type(exc).__name__}: {exc}'
+    result['seconds'] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def load_jobs(source: str, location: str | None = None) -> list[dict]:
+    """
+    Builds the job list from a manifest CSV (columns `video`, `location`)
+    or a directory of videos. For directories the location is `location`,
+    or else the name of the folder holding each video.
+    """
+    if os.path.isfile(source):
+        with open(source, newline='') as f:
+            return [{'video': r['video'], 'location': r.get('location') or location}
+                    for r in csv.DictReader(f)]
+    jobs = []
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTS):
+                jobs.append({'video': os.path.join(root, name),
+                             'location': location or os.path.basename(root)})
+    return jobs
+
+
+def run_batch(
+    jobs: list[dict],
+    workers: int = 2,
+    threads_per_worker: int | None = None,
+    snapshot_dir: str = 'snapshots',
+    detailed_csv: str = 'violations.csv',
+    fined_csv: str = 'fined.csv',
+    summary_csv: str | None = 'batch_summary.csv',
+    totals_csv: str | None = 'batch_totals.csv',
+    plate_weights: str | None = None,
+    on_result=None,
+    **options,
+) -> list[dict]:
+    """
+    Analyzes every job on a pool of `workers` processes.
+
+    Args:
+        jobs: dicts with `video` and `location`
+        workers: number of worker processes
+        threads_per_worker: intra-op thread cap per worker
+            (defaults to cores // workers)
+        snapshot_dir, detailed_csv, fined_csv: shared outputs of all workers
+        summary_csv: per-video results are appended here; None to skip
+        totals_csv: per-location totals of the batch are appended here
+            once it finishes; None to skip
+        plate_weights: plate model weights (defaults to PLATE_WEIGHTS)
+        on_result: optional callback invoked with each finished result
+        **options: other analyze_video arguments (detect_scale, ...)
+
+    Returns:
+        one result dict per job, in completion order
+    """
+    from violation_sink import append_csv
+
+    if threads_per_worker is None:
+        threads_per_worker = max((os.cpu_count() or 1) // max(workers, 1), 1)
+    options.update(snapshot_dir=snapshot_dir, detailed_csv=detailed_csv, fined_csv=fined_csv)
+
+    results = []
+    # spawn so workers import torch fresh, after their thread caps are set
+    ctx = mp.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=init_worker,
+                             initargs=(threads_per_worker, plate_weights)) as pool:
+        futures = [pool.submit(_run_one, job, options, plate_weights) for job in jobs]
+        for fut in as_completed(futures):
+            res = fut.result()
+            results.append(res)
+            if summary_csv:
+                append_csv(summary_csv, BATCH_SUMMARY_FIELDS,
+                           [dict(res, timestamp=datetime.now().isoformat())])
+            if on_result:
+                on_result(res)
+    if totals_csv and results:
+        append_csv(totals_csv, BATCH_TOTALS_FIELDS, location_rows(results))
+    return results
+
+
+def totals_by_location(results: list[dict]) -> dict[str, tuple[int, int]]:
+    """Aggregates (cars_passed, violations) per location."""
+    totals = defaultdict(lambda: [0, 0])
+    for r in results:
+        totals[r['location']][0] += r['cars_passed']
+        totals[r['location']][1] += r['violations']
+    return {loc: tuple(v) for loc, v in totals.items()}
+
+
+def location_rows(results: list[dict]) -> list[dict]:
+    """One BATCH_TOTALS_FIELDS row per location of a finished batch."""
+    ts = datetime.now().isoformat()
+    rows = {}
+    for r in results:
+        row = rows.setdefault(r['location'], dict(
+            timestamp=ts, location=r['location'], videos=0, failed=0,
+            cars_passed=0, violations=0, seconds=0.0))
+        row['videos'] += 1
+        row['failed'] += bool(r['error'])
+        row['cars_passed'] += r['cars_passed']
+        row['violations'] += r['violations']
+        row['seconds'] = round(row['seconds'] + r['seconds'], 2)
+    return [rows[loc] for loc in sorted(rows)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Batch red-light violation analysis')
+    ap.add_argument('source', help='directory of videos or manifest CSV (video,location)')
+    ap.add_argument('--location', help='location for every video in a directory')
+    ap.add_argument('--workers', type=int, default=2)
+    ap.add_argument('--threads-per-worker', type=int)
+    ap.add_argument('--snapshot-dir', default='snapshots')
+    ap.add_argument('--detailed-csv', default='violations.csv')
+    ap.add_argument('--fined-csv', default='fined.csv')
+    ap.add_argument('--summary-csv', default='batch_summary.csv')
+    ap.add_argument('--totals-csv', default='batch_totals.csv',
+                    help='per-location totals of the run are appended here')
+    ap.add_argument('--detect-scale', type=float, default=0.5)
+    ap.add_argument('--stop-line-y', type=int, default=700)
+    ap.add_argument('--batch-size', type=int, default=1)
+    ap.add_argument('--pipelined', action='store_true')
+    args = ap.parse_args()
+
+    jobs = load_jobs(args.source, args.location)
+    if not jobs:
+        ap.error(f'no videos found in {args.source}')
+
+    def report(res):
+        status = res['error'] or f"{res['cars_passed']} cars, {res['violations']} violations"
+        print(f"[{res['location']}] {res['video']}: {status} ({res['seconds']}s)")
+
+    results = run_batch(
+        jobs, workers=args.workers, threads_per_worker=args.threads_per_worker,
+        summary_csv=args.summary_csv, totals_csv=args.totals_csv, on_result=report,
+        snapshot_dir=args.snapshot_dir, detailed_csv=args.detailed_csv,
+        fined_csv=args.fined_csv, detect_scale=args.detect_scale,
+        stop_line_y=args.stop_line_y, batch_size=args.batch_size,
+        pipelined=args.pipelined,
+    )
+    for loc, (cars, viol) in sorted(totals_by_location(results).items()):
+        print(f'{loc}: {cars} cars passed, {viol} violations')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+# benchmark.py
+"""
+Benchmark and regression check for the violation pipeline.
+
+Renders deterministic synthetic traffic videos (blue boxes driving down
+three lanes across a stop line under a scripted red/green light) and runs
+them, plus any recorded clips given on the command line, through
+`analyze_video` under several option sets. Every run happens in a fresh
+process and reports per-stage timings, end-to-end fps, p50/p99 frame
+latency and peak RSS.
+
+With --stub the YOLO models and OCR are replaced by cheap colour-segmentation
+stand-ins, so the suite runs offline on CPU in seconds; stub mode only makes
+sense on the synthetic videos.
+
+Usage:
+    python benchmark.py --stub
+    python benchmark.py --stub --save-baseline
+    python benchmark.py --video camera_capture_1748094569.mp4 --scenario pipelined
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+BASELINE_JSON = 'bench_baseline.json'
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'tvs_bench')
+
+# option sets passed to analyze_video
+SCENARIOS = {
+    'default': {},
+    'pipelined': {'pipelined': True, 'batch_size': 4},
+    'stride': {'detect_stride': 3, 'adaptive_stride': True},
+    'fixed_stride': {'detect_stride': 4},
+    'roi': {'roi_band': 200},
+}
+
+# scene layout of the synthetic videos
+WIDTH, HEIGHT = 1280, 720
+STOP_LINE_Y = 450
+LANES = (420, 640, 860)
+CAR_W, CAR_H = 120, 170
+BACKGROUND = (90, 90, 90)
+LIGHT_BOX = (40, 30, 100, 180)       # x1, y1, x2, y2 of the signal head
+
+
+def light_at(frame_idx: int, cycle: int = 90) -> str:
+    """Scripted signal: `cycle` frames green, then `cycle` frames red."""
+    return 'green' if (frame_idx // cycle) % 2 == 0 else 'red'
+
+
+def _cars(n_frames: int, seed: int):
+    """Deterministic car schedule: (lane x, first frame, speed px/frame, plate)."""
+    rng = np.random.default_rng(seed)
+    cars = []
+    for x in LANES:
+        t = int(rng.integers(0, 30))
+        speed = int(rng.integers(6, 12))
+        while t < n_frames:
+            plate = ''.join(rng.choice(list('ABCDEFGHJKLMNPRSTUVWXYZ'), 3)) + f'{rng.integers(1000, 9999)}'
+            cars.append((x, t, speed, plate))
+            # leave a gap so boxes in one lane never touch
+            t += (CAR_H + 80) // speed + int(rng.integers(0, 40))
+    return cars
+
+
+def expected_violations(n_frames: int, seed: int = 0) -> int:
+    """Cars whose centre crosses the stop line while the light is red."""
+    count = 0
+    for _, t0, speed, _ in _cars(n_frames, seed):
+        for t in range(t0, n_frames):
+            cy = -CAR_H // 2 + (t - t0) * speed
+            if cy - speed < STOP_LINE_Y <= cy:
+                count += light_at(t) == 'red'
+                break
+    return count
+
+
+def render_frame(frame_idx: int, cars) -> np.ndarray:
+    img = np.full((HEIGHT, WIDTH, 3), BACKGROUND, dtype=np.uint8)
+    cv2.line(img, (300, STOP_LINE_Y), (1000, STOP_LINE_Y), (0, 220, 220), 4)
+
+    x1, y1, x2, y2 = LIGHT_BOX
+    cv2.rectangle(img, (x1, y1), (x2, y2), (20, 20, 20), -1)
+    cx, step = (x1 + x2) // 2, (y2 - y1) // 3
+    lit = light_at(frame_idx)
+    for i, (name, colour) in enumerate((('red', (0, 0, 255)), ('yellow', (0, 200, 255)),
+                                        ('green', (0, 255, 0)))):
+        cv2.circle(img, (cx, y1 + step * i + step // 2), 18,
+                   colour if name == lit else (45, 45, 45), -1)
+
+    for x, t0, speed, plate in cars:
+        if frame_idx < t0:
+            continue
+        top = -CAR_H + (frame_idx - t0) * speed
+        if top > HEIGHT:
+            continue
+        left = x - CAR_W // 2
+        cv2.rectangle(img, (left, top), (left + CAR_W, top + CAR_H), (200, 80, 30), -1)
+        py = top + CAR_H - 40
+        cv2.rectangle(img, (left + 15, py), (left + CAR_W - 15, py + 26), (245, 245, 245), -1)
+        cv2.putText(img, plate, (left + 19, py + 19), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    return img
+
+
+def synthetic_video(n_frames: int = 600, seed: int = 0, fps: float = 25.0) -> str:
+    """Renders (or reuses) the synthetic clip for (n_frames, seed)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f'synthetic_{n_frames}_{seed}.mp4')
+    if os.path.exists(path):
+        return path
+    cars = _cars(n_frames, seed)
+    tmp = path + '.part.mp4'
+    out = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*'mp4v'), fps, (WIDTH, HEIGHT))
+    for i in range(n_frames):
+        out.write(render_frame(i, cars))
+    out.release()
+    os.replace(tmp, path)
+    return path
+
+
+# --- stub models ---------------------------------------------------------
+
+def _components(mask, min_area):
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    boxes = [(x, y, x + w, y + h) for x, y, w, h, area in stats[1:] if area >= min_area]
+    return np.array(boxes, dtype=float).reshape(-1, 4)
+
+
+def stub_detect(frames):
+    """Vehicles are the blue blobs, the signal head is the near-black box."""
+    out = []
+    for f in frames:
+        b, g, r = (f[..., i].astype(np.int16) for i in range(3))
+        vehicles = _components((b - r > 100) & (b - g > 60), 200)
+        lights = _components(f.max(axis=2) < 32, 200)
+        out.append((vehicles, lights))
+    return out
+
+
+class _Row:
+    def __init__(self, xyxy):
+        self.xyxy = xyxy
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.xyxy
+
+
+class _Boxes:
+    def __init__(self, boxes):
+        self.xyxy = [_Row(b) for b in boxes]
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = _Boxes(boxes)
+
+
+def stub_plate_model(images, verbose=False):
+    """Mimics ultralytics results: the largest white patch is the plate."""
+    if isinstance(images, np.ndarray):
+        images = [images]
+    results = []
+    for img in images:
+        boxes = _components(img.min(axis=2) > 220, 60)
+        if len(boxes):
+            areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            boxes = boxes[np.argsort(-areas)]
+        results.append(_Result(boxes))
+    return results
+
+
+def stub_read_plate(image, bbox):
+    x1, y1, x2, y2 = map(int, bbox)
+    return 'STUB%03d' % (int(image[y1:y2, x1:x2].mean()) % 1000)
+
+
+# --- runs ----------------------------------------------------------------
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _bench_one(video: str, options: dict, stub: bool) -> dict:
+    from download_weight import analyze_video
+    from profiling import StageTimer
+
+    load = time.perf_counter()
+    if stub:
+        models = dict(detector=stub_detect, plate_reader=stub_read_plate,
+                      plate_model=stub_plate_model)
+    else:
+        import model_registry
+        model_registry.preload()
+        models = {}
+    load = time.perf_counter() - load
+
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as out:
+        cars, viol = analyze_video(
+            video, 'Benchmark',
+            snapshot_dir=os.path.join(out, 'snapshots'),
+            detailed_csv=os.path.join(out, 'violations.csv'),
+            fined_csv=os.path.join(out, 'fined.csv'),
+            rollup_db=None, timer=timer,
+            **models, **options,
+        )
+    return {**timer.report(), 'cars_passed': cars, 'violations': viol,
+            'load_seconds': round(load, 3), 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_suite(videos: dict[str, str], scenarios: dict[str, dict], stub: bool,
+              stop_line_y: int | None = None) -> dict:
+    """Runs every (video, scenario) pair in its own process; keys are 'video/scenario'."""
+    ctx = mp.get_context('spawn')
+    results = {}
+    for vname, path in videos.items():
+        for sname, options in scenarios.items():
+            opts = dict(options)
+            if stop_line_y is not None:
+                opts.setdefault('stop_line_y', stop_line_y)
+            with ctx.Pool(1) as pool:
+                res = pool.apply(_bench_one, (path, opts, stub))
+            results[f'{vname}/{sname}'] = res
+            print(f"{vname}/{sname}: {res['fps']:.1f} fps, "
+                  f"p50 {res['latency_ms']['p50']:.1f} ms, p99 {res['latency_ms']['p99']:.1f} ms, "
+                  f"{res['peak_rss_mb']:.0f} MB, {res['violations']} violations")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.15) -> list[str]:
+    """Regressions of `results` against `baseline`, beyond `tolerance` (fraction)."""
+    problems = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if res['fps'] < base['fps'] * (1 - tolerance):
+            problems.append(f"{key}: fps {res['fps']} < baseline {base['fps']}")
+        if res['latency_ms']['p99'] > base['latency_ms']['p99'] * (1 + tolerance):
+            problems.append(f"{key}: p99 latency {res['latency_ms']['p99']} ms > "
+                            f"baseline {base['latency_ms']['p99']} ms")
+        if res['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            problems.append(f"{key}: peak RSS {res['peak_rss_mb']} MB > baseline {base['peak_rss_mb']} MB")
+        if res['violations'] != base['violations']:
+            problems.append(f"{key}: {res['violations']} violations, baseline had {base['violations']}")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark the red-light violation pipeline.')
+    ap.add_argument('--stub', action='store_true', help='use stub detectors/OCR (offline, fast)')
+    ap.add_argument('--frames', type=int, default=600, help='length of the synthetic video')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--video', action='append', default=[], help='recorded clip to include')
+    ap.add_argument('--no-synthetic', action='store_true')
+    ap.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                    help='option sets to run (default: all)')
+    ap.add_argument('--baseline', default=BASELINE_JSON)
+    ap.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    ap.add_argument('--tolerance', type=float, default=0.15)
+    ap.add_argument('--out', help='write the full report as JSON')
+    args = ap.parse_args()
+
+    scenarios = {k: SCENARIOS[k] for k in (args.scenario or SCENARIOS)}
+    results = {}
+    wrong = []
+    if not args.no_synthetic:
+        path = synthetic_video(args.frames, args.seed)
+        synthetic = run_suite({'synthetic': path}, scenarios, args.stub, STOP_LINE_Y)
+        results.update(synthetic)
+        expected = expected_violations(args.frames, args.seed)
+        print(f'synthetic: {expected} violations scripted')
+        if args.stub:
+            # stub detectors are exact on the synthetic scene, so any miss is a logic bug
+            wrong = [f"{key}: {res['violations']} violations, {expected} scripted"
+                     for key, res in synthetic.items() if res['violations'] != expected]
+    if args.video:
+        results.update(run_suite({os.path.basename(v): v for v in args.video}, scenarios, args.stub))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    for w in wrong:
+        print('WRONG COUNT', w)
+    if wrong:
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for p in problems:
+            print('REGRESSION', p)
+        if problems:
+            sys.exit(1)
+        print('No regressions against', args.baseline)
+
+
+if __name__ == '__main__':
+    main()
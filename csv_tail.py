@@ -0,0 +1,80 @@
+# csv_tail.py
+"""
+Incremental ingest of append-only CSV logs into SQLite, by byte offset.
+
+The offset consumed so far is stored next to the data it produced and moves
+in the same transaction, so every row is ingested exactly once however many
+threads or processes sync the same file. Used by the log index and the
+rollups.
+"""
+import io
+import os
+
+import pandas as pd
+
+SYNC_BLOCK = 32 * 1024 * 1024      # bytes of CSV parsed per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tail_state (
+    name    TEXT NOT NULL,
+    csv     TEXT NOT NULL,
+    offset  INTEGER NOT NULL,
+    header  TEXT NOT NULL,
+    PRIMARY KEY (name, csv)
+);
+"""
+
+
+def sync_tail(con, name: str, csv_path: str, consume, reset, **read_csv) -> int:
+    """
+    Feeds the rows appended to `csv_path` since the last sync under `name`
+    to `consume(con, df)` (all columns as str), one block per write
+    transaction. `reset(con)` runs inside the first transaction when the
+    CSV has not been synced under `name` yet or was truncated since, so
+    the caller can drop what it built from the old contents.
+
+    `con` must be in autocommit mode (isolation_level=None) and have
+    `SCHEMA` applied; extra keyword arguments go to `pandas.read_csv`.
+    Returns rows consumed.
+    """
+    if not os.path.exists(csv_path):
+        return 0
+    csv_path = os.path.abspath(csv_path)
+    added = 0
+    try:
+        while True:
+            con.execute('BEGIN IMMEDIATE')
+            state = con.execute('SELECT offset, header FROM tail_state WHERE name = ? AND csv = ?',
+                                (name, csv_path)).fetchone()
+            size = os.path.getsize(csv_path)
+            if state is None or size < state[0]:
+                reset(con)
+                state = (0, '')
+            offset, header = state
+            if size == offset:
+                con.execute('COMMIT')
+                return added
+
+            with open(csv_path, 'rb') as f:
+                f.seek(offset)
+                block = f.read(min(size - offset, SYNC_BLOCK))
+            # only consume complete lines; a writer may be mid-row
+            end = block.rfind(b'\n') + 1
+            if not end:
+                con.execute('COMMIT')
+                return added
+            if not header:
+                df = pd.read_csv(io.BytesIO(block[:end]), dtype=str, **read_csv)
+                header = ','.join(df.columns)
+            else:
+                df = pd.read_csv(io.BytesIO(block[:end]), names=header.split(','), header=None,
+                                 dtype=str, **read_csv)
+            consume(con, df)
+            con.execute('INSERT OR REPLACE INTO tail_state VALUES (?, ?, ?, ?)',
+                        (name, csv_path, offset + end, header))
+            con.execute('COMMIT')
+            added += len(df)
+    except BaseException:
+        if con.in_transaction:
+            con.execute('ROLLBACK')
+        raise
@@ -0,0 +1,116 @@
+# dashboard_data.py
+"""
+Cached data access for the Streamlit dashboard.
+
+Streamlit reruns app.py on every widget interaction; everything here is
+memoized on the (mtime, size) signature of the underlying files, so a rerun
+only does real work after new violations have been logged. Cached frames
+are shared between reruns and must be treated as read-only.
+"""
+import os
+
+import pandas as pd
+import streamlit as st
+
+from log_index import LOG_INDEX, LogIndex
+from rollups import ROLLUP_DB, Rollups
+
+CACHE_TTL = 600          # seconds before an entry is dropped regardless
+MAX_VIEWS = 32           # memoized (town, range) views kept per data version
+EXPORT_MAX_ROWS = 200_000  # rows in a browser download; larger exports go through the desktop app
+
+
+def file_signature(*paths) -> tuple:
+    """(mtime_ns, size) of each path, or None for missing files."""
+    sig = []
+    for p in paths:
+        try:
+            s = os.stat(p)
+            sig.append((s.st_mtime_ns, s.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def rollup_signature(path: str = ROLLUP_DB) -> tuple:
+    # WAL mode: recent writes live in the -wal file until checkpointed
+    return file_signature(path, path + '-wal')
+
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def _rollups(path: str) -> Rollups:
+    return Rollups(path)
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_VIEWS * 4, show_spinner=False)
+def _rollup_series(path: str, sig: tuple, dataset: str, grain: str,
+                   cities: tuple | None, start, end) -> pd.DataFrame:
+    return _rollups(path).series(dataset, grain, cities, start, end)
+
+
+def rollup_series(dataset: str, grain: str, cities=None, start=None, end=None,
+                  path: str = ROLLUP_DB) -> pd.DataFrame:
+    """Memoized `Rollups.series`, refreshed whenever the rollup file changes."""
+    cities = tuple(cities) if cities is not None else None
+    return _rollup_series(path, rollup_signature(path), dataset, grain, cities, start, end)
+
+
+def sync_rollups(dataset: str, csv_path: str, city_col: str = 'city',
+                 path: str = ROLLUP_DB):
+    """Rolls up rows logged to `csv_path` since the last sync."""
+    _rollups(path).sync(dataset, csv_path, city_col)
+
+
+@st.cache_resource(ttl=CACHE_TTL, show_spinner=False)
+def _log_index(path: str) -> LogIndex:
+    return LogIndex(path)
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=2, show_spinner=False)
+def _synced(path: str, csv_path: str, sig: tuple) -> tuple:
+    _log_index(path).sync(csv_path)
+    return sig
+
+
+def sync_logs(csv_path: str, path: str = LOG_INDEX) -> tuple:
+    """Brings the log index up to date with `csv_path`; returns its data version."""
+    return _synced(path, csv_path, file_signature(csv_path))
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_VIEWS, show_spinner=False)
+def _log_count(path: str, sig: tuple, town, start, end, plate_prefix) -> int:
+    return _log_index(path).count(town, start, end, plate_prefix)
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_VIEWS * 4, show_spinner=False)
+def _log_page(path: str, sig: tuple, town, start, end, plate_prefix,
+              sort, descending, page, page_size) -> pd.DataFrame:
+    return _log_index(path).page(town, start, end, plate_prefix, sort, descending, page, page_size)
+
+
+def log_count(csv_path: str, town: str | None, start, end, plate_prefix: str = '',
+              path: str = LOG_INDEX) -> int:
+    """Number of logged violations matching the filters."""
+    return _log_count(path, sync_logs(csv_path, path), town, start, end, plate_prefix)
+
+
+def log_page(csv_path: str, town: str | None, start, end, plate_prefix: str = '',
+             sort: str = 'timestamp', descending: bool = True, page: int = 0,
+             page_size: int = 100, path: str = LOG_INDEX) -> pd.DataFrame:
+    """One page of the filtered, sorted violation log, from the SQLite index."""
+    return _log_page(path, sync_logs(csv_path, path), town, start, end, plate_prefix,
+                     sort, descending, page, page_size)
+
+
+def export_logs(csv_path: str, town: str | None, start, end,
+                plate_prefix: str = '', path: str = LOG_INDEX,
+                limit: int = EXPORT_MAX_ROWS) -> bytes:
+    """
+    The first `limit` rows of the filtered log as CSV bytes for
+    `st.download_button`, which needs the whole payload in memory; the rows
+    are fetched from the index in chunks.
+    """
+    sync_logs(csv_path, path)
+    chunks = _log_index(path).iter_csv(city=town, start=start, end=end,
+                                       plate_prefix=plate_prefix, limit=limit)
+    return ''.join(chunks).encode()
@@ -1,14 +1,29 @@
 # detectors.py
 
-from ultralytics import YOLO
+import numpy as np
 
-# 1. Load a pretrained YOLO model. 
-#    'yolov8n.pt' is the lightweight nano model—fast to download & test.
-model = YOLO('yolov8n.pt')
+from model_registry import VEHICLE_WEIGHTS, get_model
+
+# The pretrained YOLO model is loaded lazily on first use, once per process.
+# 'yolov8n.pt' is the lightweight nano model—fast to download & test.
+def _model():
+    return get_model(VEHICLE_WEIGHTS)
 
 # Define COCO class IDs for vehicles & traffic lights
 VEHICLE_CLASSES = {2, 3, 5, 7}   # car, motorcycle, bus, truck
 TRAFFIC_LIGHT_CLASS = 9
+_VEHICLE_CLASS_IDS = np.array(sorted(VEHICLE_CLASSES))
+
+
+def _split_boxes(results):
+    """
+    Splits one YOLO result into (vehicle_boxes, tl_boxes) float arrays of
+    shape (N, 4), copying boxes and classes to the host once per result.
+    """
+    xyxy = results.boxes.xyxy.cpu().numpy()
+    cls = results.boxes.cls.cpu().numpy().astype(int)
+    return xyxy[np.isin(cls, _VEHICLE_CLASS_IDS)], xyxy[cls == TRAFFIC_LIGHT_CLASS]
+
 
 def detect_objects(frame):
     """
@@ -17,18 +32,17 @@ def detect_objects(frame):
       - tl_boxes:      list of [x1,y1,x2,y2]
       - raw_results:   the full YOLO results object (for debugging)
     """
-    results = model(frame)[0]  
-    vehicle_boxes = []
-    tl_boxes = []
-    
-    # Iterate detections
-    for box, cls in zip(results.boxes.xyxy, results.boxes.cls):
-        coords = box.cpu().numpy().tolist()     # [x1, y1, x2, y2]
-        cls_id  = int(cls.cpu().numpy())
-        
-        if cls_id in VEHICLE_CLASSES:
-            vehicle_boxes.append(coords)
-        elif cls_id == TRAFFIC_LIGHT_CLASS:
-            tl_boxes.append(coords)
-    
-    return vehicle_boxes, tl_boxes, results
+    results = _model()(frame)[0]
+    vehicle_boxes, tl_boxes = _split_boxes(results)
+    return vehicle_boxes.tolist(), tl_boxes.tolist(), results
+
+
+def detect_objects_batch(frames):
+    """
+    Runs YOLO on a list of frames in a single forward pass and returns one
+    (vehicle_boxes, tl_boxes) pair per frame, each an (N, 4) float array of
+    [x1,y1,x2,y2].
+    """
+    if not len(frames):
+        return []
+    return [_split_boxes(r) for r in _model()(list(frames), verbose=False)]
@@ -1,17 +1,82 @@
 import cv2
+import itertools
+import math
 import os
-import pandas as pd
-import csv
+import time
+from collections import deque
+from contextlib import nullcontext
 from datetime import datetime
-from detectors import detect_objects
-from traffic_light import classify_light_color
-from plate_ocr_hf import read_plate
-from tracker import CentroidTracker
-from ultralytics import YOLO
+from detectors import detect_objects_batch
+from array_tracker import ArrayTracker
+from pipeline import iter_stages, run_pipeline
+from plate_locator import PlateLocator
+from plate_voting import PlateVoter
+from violation_sink import CsvSink, SnapshotWriter, append_csv, SUMMARY_FIELDS, VIOLATION_FIELDS
+from stride import DetectionStride, MotionModel
+from roi import LightLock, band_tiles, merge_tiles, stop_line_band
+from light_state import LightState, classify_heads
+from rollups import ROLLUP_DB, Rollups
+from evidence import EvidenceRecorder
+from model_registry import PLATE_WEIGHTS, get_model
+
+
+def _read_frames(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+
+
+def _batched(frames, batch_size: int = 1):
+    """Yields lists of up to `batch_size` consecutive frames."""
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _light_at_crossing(readings, prev, cy: int, frame_idx: int, stop_line_y: int):
+    """
+    (light, red_pending) for a track crossing the stop line between its
+    previous position `prev` (cx, cy, frame idx) and `cy` on `frame_idx`.
+
+    The crossing frame is interpolated between the two positions. If the
+    light was read on that frame its read is used; otherwise the light may
+    have changed in the skipped frames around it, and the read nearest the
+    crossing is the best guess rather than whichever one came after it.
+    """
+    _, prev_cy, prev_idx = prev
+    crossed = prev_idx + (stop_line_y - prev_cy) / (cy - prev_cy) * (frame_idx - prev_idx)
+    exact = [r for r in readings if r[0] == math.ceil(crossed)]
+    _, light, pending = exact[0] if exact else min(readings, key=lambda r: abs(r[0] - crossed))
+    return light, pending
+
+
+def analyze_video(video_path: str, location: str, *args, **kwargs) -> tuple[int, int]:
+    """
+    Analyze a video file for red-light violations.
+    Takes the same arguments as `analyze_frames` after `frames`.
+
+    Returns:
+        (cars_passed, violations)
+    """
+    cap = cv2.VideoCapture(video_path)
+    kwargs.setdefault('total_frames', int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    kwargs.setdefault('fps', cap.get(cv2.CAP_PROP_FPS) or 25.0)
+    try:
+        return analyze_frames(_read_frames(cap), location, *args, **kwargs)
+    finally:
+        cap.release()
+
 
 # Core processing for video analysis
-def analyze_video(
-    video_path: str,
+def analyze_frames(
+    frames,
     location: str,
     snapshot_dir: str,
     detailed_csv: str,
@@ -19,12 +84,36 @@ def analyze_video(
     detect_scale: float = 0.5,
     stop_line_y: int = 700,
     tracker_max_disappeared: int = 40,
+    tracker_max_distance: float = 150.0,
+    pipelined: bool = False,
+    queue_size: int = 4,
+    batch_size: int = 1,
+    detect_stride: int = 1,
+    adaptive_stride: bool = False,
+    stride_band: int = 150,
+    roi_band: int | None = None,
+    light_recheck_every: int = 30,
+    light_confirm: int = 3,
+    plate_model=None,
+    rollup_db: str | None = ROLLUP_DB,
+    progress=None,
+    should_stop=None,
+    progress_every: int = 15,
+    total_frames: int = 0,
+    fps: float = 25.0,
+    realtime: bool = False,
+    clip_seconds: tuple[float, float] | None = (2.0, 2.0),
+    clip_scale: float = 0.25,
+    detector=None,
+    light_classifier=None,
+    plate_reader=None,
+    timer=None,
 ) -> tuple[int, int]:
     """
-    Analyze a video for red-light violations.
+    Analyze a stream of frames for red-light violations.
 
     Args:
-        video_path: path to input video file
+        frames: iterable of BGR frames (decoded video, live camera, ...)
         location: city name for logs
         snapshot_dir: directory for plate snapshots
         detailed_csv: path for per-violation logging
@@ -32,92 +121,280 @@ def analyze_video(
         detect_scale: scale factor for detection
         stop_line_y: y-coordinate of stop line
         tracker_max_disappeared: frames to tolerate missing objects
+        tracker_max_distance: pixels a vehicle may move per frame and still
+            match its track; scaled by the frames between detections
+        pipelined: run decode, resize and detection on separate threads
+        queue_size: capacity of the queues between pipeline stages
+        batch_size: frames per YOLO forward pass
+        detect_stride: run detection every N frames; tracked centroids are
+            extrapolated from their velocity in between
+        adaptive_stride: drop the stride to 1 while any vehicle is near the
+            stop line, so crossings are always judged on detected frames
+        stride_band: distance in pixels from the stop line that counts as near;
+            also where plate crops are collected before a crossing
+        roi_band: if set, detect vehicles only on the full-width strip within
+            this many pixels of the stop line, at native resolution: the
+            strip is cut into overlapping tiles about the detector's input
+            width, detected as one batch, and vehicles cut by a tile edge
+            are joined again
+        light_recheck_every: in ROI mode, frames between full-frame traffic
+            light re-detections; the last found box is reused in between
+        light_confirm: consecutive red reads before a signal head counts
+            as red; leaving red takes effect on the first other read.
+            Crossings during those reads are held and fined once red is
+            confirmed, so the start of a red phase isn't lost
+        plate_model: plate detector; defaults to the shared registry model
+        rollup_db: dashboard rollups updated as violations are logged;
+            None to skip
+        progress: callback receiving a dict with frames, total_frames, fps,
+            cars_passed and violations every `progress_every` frames
+        should_stop: callable polled every `progress_every` frames; when it
+            returns True the analysis stops early and no summary is written
+        progress_every: frames between progress reports / stop checks
+        total_frames: expected number of frames, for progress reports
+        fps: frame rate of the source, for evidence clips
+        realtime: frames come from a live source that may drop frames;
+            evidence clips then play at the rate frames actually arrived
+        clip_seconds: (before, after) seconds of video saved next to each
+            violation snapshot; None disables evidence clips
+        clip_scale: downscale factor of frames kept for evidence clips
+        detector: batched vehicle/traffic-light detector, frames ->
+            [(vehicle_boxes, tl_boxes)]; defaults to `detect_objects_batch`
+        light_classifier: (frame, boxes) -> [colour or None per box];
+            defaults to `light_state.classify_heads`
+        plate_reader: (image, bbox) -> text; defaults to `plate_ocr_hf.read_plate`
+        timer: optional `profiling.StageTimer` (or `metrics.Metrics`) collecting
+            per-stage timings, event counts and queue depths
 
     Returns:
         (cars_passed, violations)
     """
     os.makedirs(snapshot_dir, exist_ok=True)
-    vehicle_tracker = CentroidTracker(max_disappeared=tracker_max_disappeared)
-    plate_model = YOLO('license-plate-finetune-v1x.pt')
+    vehicle_tracker = ArrayTracker(max_disappeared=tracker_max_disappeared,
+                                   max_distance=tracker_max_distance)
+    if detector is None:
+        detector = detect_objects_batch
+    if light_classifier is None:
+        light_classifier = classify_heads
+    if plate_reader is None:
+        from plate_ocr_hf import read_plate as plate_reader
+    if plate_model is None:
+        plate_model = get_model(PLATE_WEIGHTS)
+    if timer:
+        detector = timer.wrap(detector, 'detect')
+        light_classifier = timer.wrap(light_classifier, 'light')
+        plate_reader = timer.wrap(plate_reader, 'ocr')
+        plate_model = timer.wrap(plate_model, 'plate')
+        frames = timer.source(frames)
+        span, count = timer.span, timer.count
+    else:
+        span = lambda stage: nullcontext()
+        count = lambda name, n=1: None
+    plate_locator = PlateLocator(plate_model)
+    plate_voter = PlateVoter(plate_locator, plate_reader)
 
-    cap = cv2.VideoCapture(video_path)
-    prev_centroids: dict[int, tuple[int,int]] = {}
+    prev_centroids: dict[int, tuple[int,int,int]] = {}   # (cx, cy, frame idx)
+    # (frame idx, light, red pending) of recent detected frames
+    light_reads: deque = deque(maxlen=32)
     violated_ids: set[int] = set()
+    # crossings while red was being confirmed: (track id, frame idx, frame, box)
+    held: list[tuple] = []
     cars_passed = 0
     violations = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    # how far ahead of the consumer the detect decision is taken
+    lookahead = max(detect_stride, 1) + batch_size * (queue_size if pipelined else 1)
+    # a decision taken `lookahead` frames ahead may skip the next stride
+    # frames, so tracks are extrapolated to the end of that window
+    horizon = lookahead + max(detect_stride, 1)
+    stride = DetectionStride(detect_stride, adaptive_stride, stop_line_y, stride_band,
+                             delay=lookahead)
+    motion = MotionModel()
+    frame_counter = itertools.count()
+
+    light_lock = LightLock(light_recheck_every)
+    lights = LightState(light_classifier, confirm=light_confirm)
+
+    def prepare(batch):
+        # pick the frames to detect on and build their detector inputs
+        items = []
+        for f in batch:
+            idx = next(frame_counter)
+            if not stride.should_detect(idx):
+                items.append((idx, f, None, 0, None))
+                continue
+            with span('resize'):
+                if roi_band is None:
+                    small = cv2.resize(f, (0,0), fx=detect_scale, fy=detect_scale)
+                    items.append((idx, f, small, 0, None))
+                else:
+                    crop, y0 = stop_line_band(f, stop_line_y, roi_band)
+                    light_in = None
+                    if light_lock.needs_check(idx):
+                        light_in = cv2.resize(f, (0,0), fx=detect_scale, fy=detect_scale)
+                    items.append((idx, f, band_tiles(crop), y0, light_in))
+        return items
+
+    def detect(items):
+        # returns [(frame, (vehicles, tls) | None)] in full-frame coordinates;
+        # in ROI mode each frame's input is a list of (band tile, x offset)
+        if roi_band is None:
+            veh_in = [it[2] for it in items if it[2] is not None]
+        else:
+            veh_in = [tile for it in items if it[2] is not None for tile, _ in it[2]]
+        veh_dets = iter(detector(veh_in))
+        light_in = [it[4] for it in items if it[4] is not None]
+        light_dets = iter(detector(light_in) if light_in else [])
+        out = []
+        for idx, f, veh_in, y0, light_in in items:
+            if veh_in is None:
+                out.append((f, None))
+                continue
+            if roi_band is None:
+                vehicles, tls = next(veh_dets)
+                vehicles, tls = vehicles / detect_scale, tls / detect_scale
+            else:
+                offsets = [x0 for _, x0 in veh_in]
+                vehicles = merge_tiles([next(veh_dets)[0] for _ in offsets], offsets, y0)
+                if light_in is not None:
+                    light_lock.update(next(light_dets)[1] / detect_scale)
+                tls = light_lock.boxes
+            out.append((f, (vehicles, tls)))
+        return out
+
+    # decode -> prepare -> detect, optionally each on its own thread;
+    # tracking and violation logic stay on this thread in frame order
+    stages = [prepare, detect]
+    if pipelined:
+        batches = run_pipeline(_batched(frames, batch_size), stages, maxsize=queue_size,
+                               monitor=timer.watch_queues if timer else None)
+    else:
+        batches = iter_stages(_batched(frames, batch_size), stages)
+    detected = (item for batch in batches for item in batch)
+    if timer:
+        detected = timer.sink(detected)
+
+    rollups = Rollups(rollup_db) if rollup_db else None
+    violation_log = CsvSink(
+        detailed_csv, VIOLATION_FIELDS,
+        on_flush=(lambda rows: rollups.sync('violations', detailed_csv)) if rollups else None,
+    )
+    snapshots = SnapshotWriter()
+    evidence = None
+    if clip_seconds:
+        evidence = EvidenceRecorder(fps, *clip_seconds, scale=clip_scale,
+                                    clock=time.monotonic if realtime else None)
+    try:
+        started = time.perf_counter()
+        stopped = False
+        for frame_idx, (frame, dets) in enumerate(detected):
+            if frame_idx % progress_every == 0:
+                if should_stop and should_stop():
+                    stopped = True
+                    break
+                if progress:
+                    progress({
+                        'frames': frame_idx,
+                        'total_frames': total_frames,
+                        'fps': frame_idx / max(time.perf_counter() - started, 1e-6),
+                        'cars_passed': cars_passed,
+                        'violations': violations,
+                    })
+            if evidence:
+                with span('io'):
+                    evidence.push(frame_idx, frame)
+            if dets is None:
+                # skipped frame: extrapolate tracks to keep the stride decision fresh
+                stride.observe(frame_idx, motion.predict(frame_idx + horizon))
+                count('skipped_frames')
+                continue
+            vehicle_boxes, tl_boxes = dets
+
+            # traffic light colour, smoothed over frames and all signal heads
+            current_light = lights.update(frame, tl_boxes)
+            red_pending = current_light != 'red' and lights.red_pending()
+            if current_light != 'red' and not red_pending:
+                # the red reads didn't hold up: nobody crossed on red
+                held.clear()
+            light_reads.append((frame_idx, current_light, red_pending))
+
+            # track & count cars
+            with span('tracking'):
+                tracked = vehicle_tracker.update(vehicle_boxes, frame_idx, frame.shape)
+                # expired tracks can't cross again; drop their per-track state
+                for oid in vehicle_tracker.evicted:
+                    prev_centroids.pop(oid, None)
+                    violated_ids.discard(oid)
+                motion.update(frame_idx, tracked)
+                stride.observe(frame_idx, tracked, motion.predict(frame_idx + horizon))
+                boxes = vehicle_tracker.current_boxes()
+            plate_voter.evict(vehicle_tracker.evicted)
+            violators = []
+            for oid, (cx, cy) in tracked.items():
+                prev = prev_centroids.get(oid)
+                if prev and prev[1] < stop_line_y <= cy:
+                    cars_passed += 1
+                    count('cars_passed')
+                    light, pending = _light_at_crossing(light_reads, prev, cy, frame_idx, stop_line_y)
+                    if light == 'red' or pending:
+                        # an undetected violator keeps its predicted box
+                        box = boxes.get(oid) or vehicle_tracker.predicted_boxes()[oid]
+                        (violators if light == 'red' else held).append((oid, frame_idx, frame, box))
+                elif oid in boxes and cy < stop_line_y and stop_line_y - cy <= stride_band:
+                    # approaching the line: keep sharp crops for the plate read
+                    with span('plate'):
+                        plate_voter.observe(oid, frame, boxes[oid])
+                prev_centroids[oid] = (cx, cy, frame_idx)
+
+            if current_light == 'red' and held:
+                # red is confirmed: crossings made while it was pending count too
+                violators, held = held + violators, []
+            violators = [v for v in violators if v[0] not in violated_ids]
+            for oid, *_ in violators:
+                violated_ids.add(oid)
+                violations += 1
+                count('violations')
+
+            # one batched plate pass over the best crops of all violators
+            reads = plate_voter.read([(oid, vframe, box) for oid, _, vframe, box in violators])
+            for (_, vidx, vframe, vbox), (plate_text, crop) in zip(violators, reads):
+                if crop is None:
+                    # no plate inside the violator's box: log it unread, the vehicle as evidence
+                    x1, y1, x2, y2 = (max(int(v), 0) for v in vbox)
+                    crop = vframe[y1:y2, x1:x2]
+                    if not crop.size:
+                        crop = vframe
+
+                with span('io'):
+                    plate_text = plate_text or 'UNKNOWN'
+                    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    fn = f"{ts}_{plate_text}.png"
+                    snapshots.submit(os.path.join(snapshot_dir, fn), crop)
+                    clip = ''
+                    if evidence:
+                        clip = f"{ts}_{plate_text}.mp4"
+                        evidence.trigger(vidx, os.path.join(snapshot_dir, clip))
+
+                    # detailed log
+                    violation_log.write({
+                        'timestamp': datetime.now().isoformat(),
+                        'city': location,
+                        'plate': plate_text,
+                        'light_color': current_light,
+                        'snapshot': fn,
+                        'clip': clip,
+                    })
+    finally:
+        stride.close()
+        batches.close()
+        with span('io'):
+            if evidence:
+                evidence.close()
+            snapshots.close()
+            violation_log.close()
 
-        small = cv2.resize(frame, (0,0), fx=detect_scale, fy=detect_scale)
-        vehicles_sm, tls_sm, _ = detect_objects(small)
-
-        # scale vehicle bboxes back\        
-        vehicles = [(
-            int(x1/detect_scale), int(y1/detect_scale),
-            int(x2/detect_scale), int(y2/detect_scale)
-        ) for x1,y1,x2,y2 in vehicles_sm]
-
-        # detect traffic light color
-        current_light = None
-        if tls_sm:
-            tl = tls_sm[0]
-            x1_t,y1_t,x2_t,y2_t = [int(v/detect_scale) for v in tl]
-            current_light = classify_light_color(frame, (x1_t,y1_t,x2_t,y2_t))
-
-        # track & count cars
-        tracked = vehicle_tracker.update(vehicles)
-        for oid, (cx, cy) in tracked.items():
-            prev = prev_centroids.get(oid)
-            if prev and prev[1] < stop_line_y <= cy:
-                cars_passed += 1
-                if current_light == 'red' and oid not in violated_ids:
-                    violated_ids.add(oid)
-                    violations += 1
-
-                    # attempt to find matching plate bbox
-                    vb = next((b for b in vehicles if b[0]<=cx<=b[2] and b[1]<=cy<=b[3]), None)
-                    plate_bbox = None
-                    if vb:
-                        # detect plates on original frame
-                        res = plate_model(frame)[0]
-                        for det in res.boxes.xyxy.cpu().numpy():
-                            x1p,y1p,x2p,y2p = map(int, det)
-                            if x1p>=vb[0] and y1p>=vb[1] and x2p<=vb[2] and y2p<=vb[3]:
-                                plate_bbox = (x1p,y1p,x2p,y2p)
-                                break
-                    if not plate_bbox:
-                        res = plate_model(frame)[0]
-                        if res.boxes:
-                            bx = res.boxes.xyxy[0].cpu().numpy()
-                            plate_bbox = tuple(map(int,bx))
-
-                    if plate_bbox:
-                        x1p,y1p,x2p,y2p = plate_bbox
-                        crop = frame[y1p:y2p, x1p:x2p]
-                        plate_text = read_plate(frame, plate_bbox) or 'UNKNOWN'
-                        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        fn = f"{ts}_{plate_text}.png"
-                        cv2.imwrite(os.path.join(snapshot_dir, fn), crop)
-
-                        # detailed log
-                        row = {
-                            'timestamp': datetime.now().isoformat(),
-                            'city': location,
-                            'plate': plate_text,
-                            'snapshot': fn
-                        }
-                        first = not os.path.exists(detailed_csv)
-                        with open(detailed_csv, 'a', newline='') as f:
-                            w = csv.DictWriter(f, fieldnames=row.keys())
-                            if first: w.writeheader()
-                            w.writerow(row)
-
-            prev_centroids[oid] = (cx, cy)
-
-    cap.release()
+    if stopped:
+        return cars_passed, violations
 
     # summary log
     summary = {
@@ -126,10 +403,8 @@ def analyze_video(
         'cars_passed': cars_passed,
         'violations': violations
     }
-    first = not os.path.exists(fined_csv)
-    with open(fined_csv, 'a', newline='') as f:
-        w = csv.DictWriter(f, fieldnames=summary.keys())
-        if first: w.writeheader()
-        w.writerow(summary)
+    append_csv(fined_csv, SUMMARY_FIELDS, [summary])
+    if rollups:
+        rollups.sync('fined', fined_csv, city_col='location')
 
     return cars_passed, violations
@@ -0,0 +1,103 @@
+# evidence.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """
+    Fixed-size ring of the most recent frames, stored downscaled in one
+    array allocated on the first push. Memory use never grows after that.
+    """
+    def __init__(self, capacity: int, scale: float = 0.25):
+        self.capacity = max(int(capacity), 1)
+        self.scale = scale
+        self._buf = None
+        self._idx = np.full(self.capacity, -1, dtype=np.int64)
+        self._ts = np.full(self.capacity, np.nan)
+
+    def push(self, frame_idx: int, frame, ts: float = np.nan):
+        if self._buf is None:
+            h, w = frame.shape[:2]
+            size = (max(int(w * self.scale), 2) // 2 * 2, max(int(h * self.scale), 2) // 2 * 2)
+            self._buf = np.empty((self.capacity, size[1], size[0], 3), dtype=np.uint8)
+        slot = frame_idx % self.capacity
+        cv2.resize(frame, self._buf.shape[2:0:-1], dst=self._buf[slot],
+                   interpolation=cv2.INTER_AREA)
+        self._idx[slot] = frame_idx
+        self._ts[slot] = ts
+
+    def get(self, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Copies of the buffered frames with index in [start, end], in order,
+        and the timestamps they were pushed with.
+        """
+        if self._buf is None:
+            return np.empty((0, 0, 0, 3), dtype=np.uint8), np.empty(0)
+        slots = [i % self.capacity for i in range(max(start, 0), end + 1)
+                 if self._idx[i % self.capacity] == i]
+        return self._buf[slots].copy(), self._ts[slots]
+
+
+def _write_clip(path: str, frames: np.ndarray, fps: float):
+    if not len(frames):
+        return
+    h, w = frames.shape[1:3]
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+    for f in frames:
+        out.write(f)
+    out.release()
+
+
+class EvidenceRecorder:
+    """
+    Keeps `pre_seconds` of recent frames in a FrameRing and, when a
+    violation is triggered, writes a clip spanning `pre_seconds` before to
+    `post_seconds` after it on a background thread.
+
+    With a `clock`, every frame is stamped as it is pushed and each clip
+    plays at the rate its frames actually arrived, so a live source that
+    drops frames doesn't produce sped-up clips; otherwise clips play at
+    `fps`.
+    """
+    def __init__(self, fps: float = 25.0, pre_seconds: float = 2.0, post_seconds: float = 2.0,
+                 scale: float = 0.25, max_pending: int = 4, clock=None):
+        self.fps = fps or 25.0
+        self.clock = clock
+        self.pre = int(pre_seconds * self.fps)
+        self.post = int(post_seconds * self.fps)
+        self.ring = FrameRing(self.pre + self.post + 1, scale)
+        self._pending: list[tuple[int, int, str]] = []
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='evidence')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def push(self, frame_idx: int, frame):
+        self.ring.push(frame_idx, frame, self.clock() if self.clock else np.nan)
+        ready = [p for p in self._pending if p[1] <= frame_idx]
+        if ready:
+            self._pending = [p for p in self._pending if p[1] > frame_idx]
+            for start, end, path in ready:
+                self._submit(start, end, path)
+
+    def trigger(self, frame_idx: int, path: str):
+        """Schedules a clip around `frame_idx`, written once its last frame arrives."""
+        self._pending.append((frame_idx - self.pre, frame_idx + self.post, path))
+
+    def _submit(self, start, end, path):
+        frames, stamps = self.ring.get(start, end)
+        fps = self.fps
+        if len(stamps) > 1 and stamps[-1] > stamps[0]:
+            fps = (len(stamps) - 1) / (stamps[-1] - stamps[0])
+        self._slots.acquire()
+        fut = self._pool.submit(_write_clip, path, frames, fps)
+        fut.add_done_callback(lambda _: self._slots.release())
+
+    def close(self):
+        """Writes clips still waiting for post-event frames with what is buffered."""
+        for start, end, path in self._pending:
+            self._submit(start, end, path)
+        self._pending = []
+        self._pool.shutdown(wait=True)
@@ -1,54 +1,200 @@
-# generate_data.py
+# generate.py
 """
-Generates a CSV file with synthetic red-light violation records for testing.
-Fields: timestamp, city, ID, plate
-Usage: python generate_data.py
+Generates synthetic violation logs and run summaries at national scale,
+for load-testing the dashboards, the log index and the rollups.
+
+Rows match the schemas analyze_video writes (violation_sink.VIOLATION_FIELDS
+and SUMMARY_FIELDS). Timestamps follow per-town traffic volumes, a daily
+rush-hour profile and quieter weekends. Output is produced in time order,
+one chunk at a time, so memory use is bounded by --chunk-size regardless of
+the number of rows.
+
+Usage:
+    python generate.py --violations 20000000 --fined 2000000
 """
+import argparse
+import time
+
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta
 
-# Configuration
-OUTPUT_CSV = 'sample_violations_2000.csv'
-NUM_ENTRIES = 2000
-START_DATE = datetime(2024, 1, 1)
-END_DATE = datetime.now()
-TOWNS = [
-    'Harare', 'Bulawayo', 'Mutare', 'Gweru', 'Kadoma', 'Chinhoyi',
-    'Bindura', 'Marondera', 'Norton', 'Masvingo', 'Chiredzi',
-    'Mutoko', 'Chipinge', 'Rusape'
-]
+from violation_sink import SUMMARY_FIELDS, VIOLATION_FIELDS
+
+# Relative traffic volume per town
+TOWN_WEIGHTS = {
+    'Harare': 30, 'Bulawayo': 14, 'Mutare': 6, 'Gweru': 5,
+    'Kadoma': 3, 'Chinhoyi': 3, 'Bindura': 2, 'Marondera': 2.5, 'Norton': 2,
+    'Masvingo': 3, 'Chiredzi': 1.5, 'Mutoko': 1, 'Chipinge': 1, 'Rusape': 1.5,
+}
+TOWNS = list(TOWN_WEIGHTS)
+
+# Share of traffic per hour of day: morning and evening rush hours
+HOUR_WEIGHTS = np.array([
+    0.4, 0.3, 0.2, 0.2, 0.3, 0.8, 2.0, 4.2, 5.0, 3.6, 3.0, 3.1,
+    3.4, 3.3, 3.2, 3.6, 4.4, 5.2, 4.8, 3.2, 2.2, 1.6, 1.0, 0.6,
+])
+# Monday .. Sunday
+WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 1.1, 0.75, 0.55])
+
+# Share of red-light runners among passing cars, per town
+VIOLATION_RATE = (0.02, 0.08)
+UNKNOWN_PLATE_RATE = 0.04
+CLIP_RATE = 0.85
+
+START_DATE = '2024-01-01'
+CHUNK_SIZE = 1_000_000
+
+
+def _day_counts(rng, n_rows: int, start, end) -> tuple[np.ndarray, np.ndarray]:
+    """Splits `n_rows` over the days in [start, end) by weekday weight."""
+    days = pd.date_range(start, end, freq='D', inclusive='left').values.astype('datetime64[D]')
+    weights = WEEKDAY_WEIGHTS[pd.DatetimeIndex(days).weekday]
+    return days, rng.multinomial(n_rows, weights / weights.sum())
+
+
+def _day_chunks(days, counts, chunk_size):
+    """Groups consecutive days into runs of about `chunk_size` rows."""
+    start, rows = 0, 0
+    for i, n in enumerate(counts):
+        rows += n
+        if rows >= chunk_size:
+            yield days[start:i + 1], counts[start:i + 1]
+            start, rows = i + 1, 0
+    if start < len(days):
+        yield days[start:], counts[start:]
+
 
+def _timestamps(rng, days, counts) -> np.ndarray:
+    """Sorted datetime64[us] timestamps: `counts[i]` on `days[i]`, rush-hour weighted."""
+    day = np.repeat(days.astype('datetime64[us]'), counts)
+    hour = rng.choice(24, size=len(day), p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    offset = hour.astype(np.int64) * 3_600_000_000 + rng.integers(0, 3_600_000_000, len(day))
+    return np.sort(day + offset.astype('timedelta64[us]'))
 
-def random_date(start, end):
-    """Return a random datetime between start and end."""
-    delta = end - start
-    seconds = random.randrange(int(delta.total_seconds()))
-    return start + timedelta(seconds=seconds)
 
+def _towns(rng, n: int) -> np.ndarray:
+    w = np.array([TOWN_WEIGHTS[t] for t in TOWNS])
+    return np.array(TOWNS, dtype=object)[rng.choice(len(TOWNS), size=n, p=w / w.sum())]
 
-def random_plate():
-    """Generate a random Zimbabwean-style license plate (e.g. 'ABC 1234')."""
-    letters = ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=3))
-    numbers = ''.join(random.choices('0123456789', k=4))
-    return f"{letters} {numbers}"
+
+def _plates(rng, n: int) -> np.ndarray:
+    """Zimbabwean-style plates ('ABC 1234'), some unread ('UNKNOWN')."""
+    chars = np.empty((n, 8), dtype=np.uint8)
+    chars[:, :3] = rng.integers(ord('A'), ord('Z') + 1, (n, 3))
+    chars[:, 3] = ord(' ')
+    chars[:, 4:] = rng.integers(ord('0'), ord('9') + 1, (n, 4))
+    plates = chars.view('S8').ravel().astype(str).astype(object)
+    plates[rng.random(n) < UNKNOWN_PLATE_RATE] = 'UNKNOWN'
+    return plates
+
+
+def _file_stamps(ts) -> np.ndarray:
+    """'YYYYmmdd_HHMMSS' for each timestamp, cut from the ISO bytes."""
+    iso = np.datetime_as_string(ts, unit='s').astype('S19').view(np.uint8).reshape(-1, 19)
+    out = np.full((len(iso), 15), ord('_'), dtype=np.uint8)
+    out[:, :8] = iso[:, [0, 1, 2, 3, 5, 6, 8, 9]]
+    out[:, 9:] = iso[:, [11, 12, 14, 15, 17, 18]]
+    return out.view('S15').ravel().astype(str).astype(object)
+
+
+def violation_chunks(n_rows: int, start=START_DATE, end=None, seed: int = 0,
+                     chunk_size: int = CHUNK_SIZE):
+    """Yields DataFrames of violation rows (VIOLATION_FIELDS) in time order."""
+    rng = np.random.default_rng(seed)
+    days, counts = _day_counts(rng, n_rows, start, end or pd.Timestamp.now().normalize())
+    for d, c in _day_chunks(days, counts, chunk_size):
+        ts = _timestamps(rng, d, c)
+        n = len(ts)
+        plates = _plates(rng, n)
+        # snapshot files are named <YYYYmmdd_HHMMSS>_<plate>.png
+        base = pd.Series(_file_stamps(ts), dtype=object) + '_' + plates
+        clips = (base + '.mp4').where(rng.random(n) < CLIP_RATE, '')
+        yield pd.DataFrame({
+            'timestamp': ts,
+            'city': _towns(rng, n),
+            'plate': plates,
+            'light_color': 'red',
+            'snapshot': base + '.png',
+            'clip': clips,
+        }, columns=VIOLATION_FIELDS)
+
+
+def fined_chunks(n_rows: int, start=START_DATE, end=None, seed: int = 1,
+                 chunk_size: int = CHUNK_SIZE):
+    """Yields DataFrames of per-run summary rows (SUMMARY_FIELDS) in time order."""
+    rng = np.random.default_rng(seed)
+    town_rate = dict(zip(TOWNS, rng.uniform(*VIOLATION_RATE, len(TOWNS))))
+    days, counts = _day_counts(rng, n_rows, start, end or pd.Timestamp.now().normalize())
+    for d, c in _day_chunks(days, counts, chunk_size):
+        ts = _timestamps(rng, d, c)
+        n = len(ts)
+        towns = _towns(rng, n)
+        # busier hours and towns see more cars per analysed clip
+        hour = ts.astype('datetime64[h]').astype(np.int64) % 24
+        volume = np.array([TOWN_WEIGHTS[t] for t in TOWNS]) ** 0.5
+        town_idx = pd.Categorical(towns, categories=TOWNS).codes
+        lam = 6 * volume[town_idx] * HOUR_WEIGHTS[hour] / HOUR_WEIGHTS.mean()
+        cars = rng.poisson(lam)
+        rate = np.array([town_rate[t] for t in TOWNS])[town_idx]
+        yield pd.DataFrame({
+            'timestamp': ts,
+            'location': towns,
+            'cars_passed': cars,
+            'violations': rng.binomial(cars, rate),
+        }, columns=SUMMARY_FIELDS)
+
+
+def write_csv(chunks, path: str) -> int:
+    """Streams `chunks` to a new CSV at `path`; returns the number of rows."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    # generated values never contain commas or quotes
+    options = pa_csv.WriteOptions(include_header=False, quoting_style='none')
+    rows = 0
+    writer = None
+    with open(path, 'wb') as f:
+        try:
+            for df in chunks:
+                # isoformat timestamps, as analyze_video writes them
+                df = df.assign(timestamp=np.datetime_as_string(df['timestamp'].values, unit='us'))
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    f.write((','.join(df.columns) + '\n').encode())
+                    writer = pa_csv.CSVWriter(f, table.schema, write_options=options)
+                writer.write_table(table)
+                rows += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+    return rows
 
 
 def main():
-    # Build dataset
-    data = {
-        'timestamp': [random_date(START_DATE, END_DATE) for _ in range(NUM_ENTRIES)],
-        'city': [random.choice(TOWNS) for _ in range(NUM_ENTRIES)],
-        'ID': list(range(1, NUM_ENTRIES + 1)),
-        'plate': [random_plate() for _ in range(NUM_ENTRIES)]
-    }
-    df = pd.DataFrame(data)
-    df.sort_values('timestamp', inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
-    # Save to CSV
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"Generated {NUM_ENTRIES} records and saved to {OUTPUT_CSV}")
+    ap = argparse.ArgumentParser(description='Generate synthetic violation data.')
+    ap.add_argument('--violations', type=int, default=2000, help='violation rows')
+    ap.add_argument('--fined', type=int, default=0, help='run summary rows')
+    ap.add_argument('--start', default=START_DATE)
+    ap.add_argument('--end', help='exclusive end date (default: today)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    ap.add_argument('--violations-csv', default='sample_violations.csv')
+    ap.add_argument('--fined-csv', default='sample_fined.csv')
+    args = ap.parse_args()
+
+    jobs = [
+        ('violations', args.violations, violation_chunks, args.violations_csv, args.seed),
+        ('fined', args.fined, fined_chunks, args.fined_csv, args.seed + 1),
+    ]
+    for name, n_rows, make, csv_path, seed in jobs:
+        if n_rows <= 0:
+            continue
+        start = time.perf_counter()
+        chunks = make(n_rows, args.start, args.end, seed=seed, chunk_size=args.chunk_size)
+        rows = write_csv(chunks, csv_path)
+        elapsed = time.perf_counter() - start
+        print(f'Generated {rows} {name} rows into {csv_path} '
+              f'in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)')
 
 
 if __name__ == '__main__':
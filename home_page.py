@@ -2,15 +2,22 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import pandas as pd
 import os
+import queue
+import threading
 import matplotlib
 matplotlib.use('TkAgg')
+import matplotlib.dates as mdates
+import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from violation_log_window import ViolationLogWindow  # your log viewer
+from rollups import Rollups
 
 # Constants
 FINED_CSV = 'fined.csv'
+DEBOUNCE_MS = 400        # quiet time after a filter change before refreshing
+POLL_MS = 50             # how often the Tk thread checks for finished aggregations
 towns = ['All','Harare','Bulawayo','Mutare','Gweru','Kadoma','Chinhoyi','Bindura',
          'Marondera','Norton','Masvingo','Chiredzi','Mutoko','Chipinge','Rusape']
 
@@ -23,12 +30,22 @@ class HomePage(ttk.Frame):
       - Bottom-left: Doughnut (Violations vs Passed)
       - Bottom-right: Bar (All monthly) or Scatter (City weekly)
       - Controls: Location, date range, Refresh, Export PNG, Violation Logs
+    Rollup queries run on a worker thread and the result is drawn on the Tk
+    thread; panels whose data didn't change are left alone, and plots whose
+    axes limits hold are updated in place and blitted.
     """
     def __init__(self, master):
         super().__init__(master)
+        self.rollups = Rollups()
+        self._results = queue.Queue()
+        self._busy = False
+        self._pending = False     # filters changed while a worker was busy
+        self._after_id = None
+        self._specs = {}          # panel name -> spec currently drawn
+        self._drawn = False
         self.pack(fill=tk.BOTH, expand=True)
         self._build_ui()
-        self._plot_all()
+        self._refresh()
 
     def _build_ui(self):
         ctrl = ttk.Frame(self)
@@ -39,18 +56,20 @@ class HomePage(ttk.Frame):
         self.loc_var = tk.StringVar(value='All')
         self.loc_cb = ttk.Combobox(ctrl, values=towns, state='readonly', textvariable=self.loc_var)
         self.loc_cb.pack(side=tk.LEFT)
-        self.loc_cb.bind('<<ComboboxSelected>>', lambda e: self._plot_all())
+        self.loc_cb.bind('<<ComboboxSelected>>', lambda e: self._schedule())
 
         ttk.Label(ctrl, text='Start (YYYY-MM-DD):').pack(side=tk.LEFT, padx=5)
         self.start_var = tk.StringVar()
+        self.start_var.trace_add('write', lambda *_: self._schedule())
         ttk.Entry(ctrl, width=12, textvariable=self.start_var).pack(side=tk.LEFT)
 
         ttk.Label(ctrl, text='End (YYYY-MM-DD):').pack(side=tk.LEFT, padx=5)
         self.end_var = tk.StringVar()
+        self.end_var.trace_add('write', lambda *_: self._schedule())
         ttk.Entry(ctrl, width=12, textvariable=self.end_var).pack(side=tk.LEFT)
 
         # Action buttons
-        ttk.Button(ctrl, text='Refresh', command=self._plot_all).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(ctrl, text='Refresh', command=lambda: self._schedule(0)).pack(side=tk.RIGHT, padx=5)
         ttk.Button(ctrl, text='Export PNG', command=self._export_png).pack(side=tk.RIGHT, padx=5)
         ttk.Button(ctrl, text='Violation Logs', command=lambda: ViolationLogWindow(self)).pack(side=tk.RIGHT, padx=5)
 
@@ -60,6 +79,7 @@ class HomePage(ttk.Frame):
         self.ax_ts   = self.fig.add_subplot(222)
         self.ax_heat = self.fig.add_subplot(223)
         self.ax_bar  = self.fig.add_subplot(224)
+        self.axes = {'pie': self.ax_pie, 'ts': self.ax_ts, 'heat': self.ax_heat, 'bar': self.ax_bar}
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -73,83 +93,217 @@ class HomePage(ttk.Frame):
             self.fig.savefig(path)
             messagebox.showinfo('Export', f'Dashboard saved to\n{path}')
 
-    def _load_data(self):
-        if not os.path.exists(FINED_CSV):
-            return pd.DataFrame()
-        df = pd.read_csv(FINED_CSV, parse_dates=['timestamp'])
-        loc = self.loc_var.get()
-        if loc != 'All':
-            df = df[df['location'] == loc]
-        if self.start_var.get().strip():
-            df = df[df['timestamp'] >= self.start_var.get().strip()]
-        if self.end_var.get().strip():
-            df = df[df['timestamp'] <= self.end_var.get().strip()]
-        return df
-
-    def _plot_all(self):
-        df = self._load_data()
-        for ax in (self.ax_pie, self.ax_ts, self.ax_heat, self.ax_bar):
-            ax.clear()
-
-        if df.empty:
-            for ax in (self.ax_pie, self.ax_ts, self.ax_heat, self.ax_bar):
-                ax.text(0.5,0.5,'No Data', ha='center', va='center')
-            self.canvas.draw()
+    # --- refresh scheduling (Tk thread) -------------------------------------
+
+    def _filters(self):
+        """(location, start, end) from the controls, or None while a date is half typed."""
+        dates = []
+        for var in (self.start_var, self.end_var):
+            text = var.get().strip()
+            if text:
+                try:
+                    pd.to_datetime(text, format='%Y-%m-%d')
+                except ValueError:
+                    return None
+            dates.append(text or None)
+        return (self.loc_var.get(), *dates)
+
+    def _schedule(self, delay: int = DEBOUNCE_MS):
+        """Refreshes once the filters have been left alone for `delay` ms."""
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(delay, self._refresh)
+
+    def _refresh(self):
+        self._after_id = None
+        filters = self._filters()
+        if filters is None:
+            return
+        if self._busy:
+            self._pending = True
+            return
+        self._busy, self._pending = True, False
+        threading.Thread(target=self._work, args=filters, daemon=True).start()
+        self.after(POLL_MS, self._poll)
+
+    def _work(self, loc, start, end):
+        try:
+            self._results.put(self._aggregate(loc, start, end))
+        except Exception as exc:
+            self._results.put(exc)
+
+    def _poll(self):
+        try:
+            result = self._results.get_nowait()
+        except queue.Empty:
+            self.after(POLL_MS, self._poll)
             return
+        self._busy = False
+        if self._pending:
+            # the filters changed while this ran; the result is stale
+            self._refresh()
+        elif isinstance(result, Exception):
+            messagebox.showerror('Dashboard', f'Could not load violations:\n{result}')
+        else:
+            self._render(result)
 
-        loc = self.loc_var.get()
+    # --- aggregation (worker thread) ----------------------------------------
+
+    def _rollup(self, grain, loc, start, end):
+        """Summary rollup of `grain` for the selected location and dates."""
+        return self.rollups.series(
+            'fined', grain,
+            cities=None if loc == 'All' else [loc],
+            start=start, end=end,
+        )
 
+    def _total(self, grain, freq, loc, start, end):
+        """Violations per bucket of `grain`, summed over cities, gaps as 0."""
+        df = self._rollup(grain, loc, start, end)
+        return df.groupby('bucket')['violations'].sum().asfreq(freq, fill_value=0)
+
+    def _aggregate(self, loc, start, end) -> dict:
+        """
+        Plain-data spec of every panel. Touches no Tk or matplotlib state,
+        so it is safe off the main thread; specs compare with ==.
+        """
+        self.rollups.sync('fined', FINED_CSV, city_col='location')
+        daily = self._rollup('day', loc, start, end)
+        if daily.empty:
+            return {name: {'kind': 'empty'} for name in self.axes}
+
+        specs = {}
         # Top-left
         if loc == 'All':
-            by_city = df.groupby('location')['violations'].sum()
-            by_city.plot.pie(ax=self.ax_pie, autopct='%1.1f%%', legend=False)
-            self.ax_pie.set_title('Violations by City')
+            by_city = daily.groupby('city')['violations'].sum()
+            specs['pie'] = {'kind': 'pie', 'title': 'Violations by City',
+                            'labels': by_city.index.tolist(), 'values': by_city.tolist()}
         else:
-            monthly = df.set_index('timestamp')['violations'].resample('M').sum()
-            self.ax_pie.bar(monthly.index.strftime('%b %Y'), monthly.values, color='teal')
-            self.ax_pie.set_title(f'Monthly Violations – {loc}')
-            self.ax_pie.tick_params(axis='x', rotation=55)
+            monthly = self._total('month', 'MS', loc, start, end)
+            specs['pie'] = {'kind': 'bar', 'title': f'Monthly Violations – {loc}',
+                            'x': monthly.index.strftime('%b %Y').tolist(), 'y': monthly.tolist(),
+                            'color': 'teal', 'rotation': 55}
 
         # Top-right
         if loc == 'All':
-            ts = (df.set_index('timestamp')
-                    .groupby('location')['violations']
-                    .resample('W').sum()
-                    .unstack(0).fillna(0))
-            for city in ts.columns:
-                self.ax_ts.plot(ts.index, ts[city], marker='o', label=city)
-            self.ax_ts.legend(fontsize='small', loc='upper left')
-            self.ax_ts.set_title('Weekly Violations by City')
+            ts = (self._rollup('week', loc, start, end)
+                    .pivot_table(index='bucket', columns='city', values='violations', aggfunc='sum')
+                    .asfreq('W-MON').fillna(0))
+            specs['ts'] = {'kind': 'lines', 'title': 'Weekly Violations by City',
+                           'x': ts.index.tolist(), 'series': {c: ts[c].tolist() for c in ts.columns},
+                           'marker': 'o', 'legend': True}
         else:
-            hourly = df.set_index('timestamp')['violations'].resample('H').sum()
-            self.ax_ts.plot(hourly.index, hourly.values, marker='.', linestyle='-')
-            self.ax_ts.set_title(f'Hourly Violations – {loc}')
-        self.ax_ts.tick_params(axis='x', rotation=45)
+            hourly = self._total('hour', 'h', loc, start, end)
+            specs['ts'] = {'kind': 'lines', 'title': f'Hourly Violations – {loc}',
+                           'x': hourly.index.tolist(), 'series': {None: hourly.tolist()},
+                           'marker': '.', 'legend': False}
 
         # Bottom-left doughnut
-        vp = df['violations'].sum()
-        cp = df['cars_passed'].sum()
-        sizes = [vp, max(cp-vp,0)]
-        wedges, texts, autotexts = self.ax_heat.pie(
-            sizes,
-            labels=['Violations','Non-Violations'],
-            autopct='%1.1f%%',
-            startangle=90,
-            wedgeprops=dict(width=0.4)
-        )
-        subtitle = f'{loc}: Violations vs Passed' if loc!='All' else 'Overall: Violations vs Passed'
-        self.ax_heat.set_title(subtitle)
+        vp = int(daily['violations'].sum())
+        cp = int(daily['cars_passed'].sum())
+        specs['heat'] = {'kind': 'doughnut',
+                         'title': f'{loc}: Violations vs Passed' if loc!='All' else 'Overall: Violations vs Passed',
+                         'values': [vp, max(cp-vp,0)]}
 
         # Bottom-right
         if loc == 'All':
-            monthly_all = df.set_index('timestamp')['violations'].resample('M').sum()
-            self.ax_bar.bar(monthly_all.index.strftime('%b %Y'), monthly_all.values, color='orange')
-            self.ax_bar.set_title('Monthly Violations')
+            monthly_all = self._total('month', 'MS', loc, start, end)
+            specs['bar'] = {'kind': 'bar', 'title': 'Monthly Violations',
+                            'x': monthly_all.index.strftime('%b %Y').tolist(), 'y': monthly_all.tolist(),
+                            'color': 'orange', 'rotation': 45}
         else:
-            weekly = df.set_index('timestamp')['violations'].resample('W').sum()
-            self.ax_bar.scatter(weekly.index, weekly.values, c='green')
-            self.ax_bar.set_title(f'Weekly Violations – {loc}')
-        self.ax_bar.tick_params(axis='x', rotation=45)
+            weekly = self._total('week', 'W-MON', loc, start, end)
+            specs['bar'] = {'kind': 'scatter', 'title': f'Weekly Violations – {loc}',
+                            'x': weekly.index.tolist(), 'y': weekly.tolist()}
+        return specs
+
+    # --- drawing (Tk thread) ------------------------------------------------
+
+    def _render(self, specs: dict):
+        full, blit = False, []
+        for name, spec in specs.items():
+            old = self._specs.get(name)
+            if spec == old:
+                continue
+            ax = self.axes[name]
+            limits = (ax.get_xlim(), ax.get_ylim())
+            if self._drawn and self._update(ax, old, spec):
+                if (ax.get_xlim(), ax.get_ylim()) == limits:
+                    blit.append(ax)
+                else:
+                    full = True
+            else:
+                self._draw(ax, spec)
+                full = True
+            self._specs[name] = spec
 
-        self.fig.tight_layout()
-        self.canvas.draw()
+        if full or not self._drawn:
+            self.fig.tight_layout()
+            self.canvas.draw_idle()
+            self._drawn = True
+        elif blit:
+            # same limits, so ticks and labels outside the axes are unchanged
+            renderer = self.canvas.get_renderer()
+            for ax in blit:
+                ax.draw(renderer)
+                self.canvas.blit(ax.bbox)
+
+    def _update(self, ax, old, spec) -> bool:
+        """Moves `old`'s artists on `ax` to `spec`'s data in place; False if it has to be redrawn."""
+        if old is None or old['kind'] != spec['kind'] or old.get('title') != spec.get('title'):
+            return False
+        kind = spec['kind']
+        if kind == 'lines':
+            if list(old['series']) != list(spec['series']):
+                return False
+            for line, ys in zip(ax.get_lines(), spec['series'].values()):
+                line.set_data(spec['x'], ys)
+        elif kind == 'bar':
+            if old['x'] != spec['x']:
+                return False
+            for rect, h in zip(ax.patches, spec['y']):
+                rect.set_height(h)
+        elif kind == 'scatter':
+            offsets = np.column_stack([mdates.date2num(spec['x']), spec['y']]) if spec['x'] \
+                else np.empty((0, 2))
+            ax.collections[0].set_offsets(offsets)
+            ax.relim()
+            ax.update_datalim(offsets)
+            ax.autoscale_view()
+            return True
+        else:
+            # wedge geometry depends on every value; pies are rebuilt
+            return False
+        ax.relim()
+        ax.autoscale_view()
+        return True
+
+    def _draw(self, ax, spec):
+        ax.clear()
+        kind = spec['kind']
+        if kind == 'empty':
+            ax.text(0.5,0.5,'No Data', ha='center', va='center')
+            return
+        if kind == 'pie':
+            pd.Series(spec['values'], index=spec['labels']).plot.pie(ax=ax, autopct='%1.1f%%', legend=False)
+        elif kind == 'bar':
+            ax.bar(spec['x'], spec['y'], color=spec['color'])
+            ax.tick_params(axis='x', rotation=spec['rotation'])
+        elif kind == 'lines':
+            for label, ys in spec['series'].items():
+                ax.plot(spec['x'], ys, marker=spec['marker'], linestyle='-', label=label)
+            if spec['legend']:
+                ax.legend(fontsize='small', loc='upper left')
+            ax.tick_params(axis='x', rotation=45)
+        elif kind == 'doughnut':
+            ax.pie(
+                spec['values'],
+                labels=['Violations','Non-Violations'],
+                autopct='%1.1f%%',
+                startangle=90,
+                wedgeprops=dict(width=0.4)
+            )
+        elif kind == 'scatter':
+            ax.scatter(spec['x'], spec['y'], c='green')
+            ax.tick_params(axis='x', rotation=45)
+        ax.set_title(spec['title'])
@@ -0,0 +1,156 @@
+# jobs.py
+"""
+Background analysis jobs for the Streamlit app.
+
+Uploads are spooled to disk and analyzed on a process pool, so the
+Streamlit script never blocks and reruns don't interrupt running jobs.
+Job state lives in a multiprocessing manager dict that workers update and
+the UI polls.
+"""
+import multiprocessing as mp
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from batch_runner import init_worker
+
+JOB_DIR = 'jobs'
+# States a job can be in; the last three are final
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+def _run_job(job_id: str, video: str, location: str, options: dict, status, cancel):
+    from download_weight import analyze_video
+    import metrics
+
+    def update(**fields):
+        status[job_id] = {**status[job_id], **fields}
+
+    if cancel.get(job_id):
+        update(state=CANCELLED, finished=datetime.now().isoformat())
+        os.remove(video)
+        return
+    update(state=RUNNING, started=datetime.now().isoformat())
+    metrics.start_exporters()
+    job_metrics = metrics.Metrics(location, camera=status[job_id]['name'])
+    state = FAILED
+    try:
+        cars, viol = analyze_video(
+            video, location,
+            progress=lambda p: update(**p),
+            should_stop=lambda: bool(cancel.get(job_id)),
+            timer=job_metrics,
+            **options,
+        )
+        state = CANCELLED if cancel.get(job_id) else DONE
+        update(state=state, cars_passed=cars, violations=viol,
+               finished=datetime.now().isoformat())
+    except Exception as exc:
+        update(state=FAILED, error=f'{type(exc).__name__}: {exc}',
+               finished=datetime.now().isoformat())
+    finally:
+        job_metrics.close(state)
+        # the spooled upload is only needed while the job runs
+        if os.path.exists(video):
+            os.remove(video)
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class JobManager:
+    """
+    Submit / status / cancel interface over a pool of analysis processes.
+
+    Args:
+        workers: concurrent analyses
+        threads_per_worker: intra-op thread cap per worker process
+        spool_dir: where uploaded videos are written
+        **options: analyze_video arguments shared by every job
+            (snapshot_dir, detailed_csv, fined_csv, ...)
+    """
+    def __init__(self, workers: int = 2, threads_per_worker: int | None = None,
+                 spool_dir: str = JOB_DIR, **options):
+        if threads_per_worker is None:
+            threads_per_worker = max((os.cpu_count() or 1) // max(workers, 1), 1)
+        options.setdefault('snapshot_dir', 'snapshots')
+        options.setdefault('detailed_csv', 'violations.csv')
+        options.setdefault('fined_csv', 'fined.csv')
+        self.options = options
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+
+        ctx = mp.get_context('spawn')
+        self._manager = ctx.Manager()
+        self._status = self._manager.dict()
+        self._cancel = self._manager.dict()
+        self._futures = {}
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx,
+            initializer=init_worker, initargs=(threads_per_worker, None),
+        )
+
+    def submit(self, upload, filename: str, location: str) -> str:
+        """
+        Spools `upload` (a file-like object or a path) to disk and queues
+        it for analysis. Returns the job id.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        video = os.path.join(self.spool_dir, f'{job_id}_{os.path.basename(filename)}')
+        if isinstance(upload, (str, os.PathLike)):
+            shutil.copyfile(upload, video)
+        else:
+            with open(video, 'wb') as out:
+                shutil.copyfileobj(upload, out, length=1 << 20)
+
+        self._status[job_id] = {
+            'id': job_id, 'name': filename, 'location': location, 'state': QUEUED,
+            'submitted': datetime.now().isoformat(), 'frames': 0, 'total_frames': 0,
+            'fps': 0.0, 'cars_passed': 0, 'violations': 0, 'error': '',
+        }
+        fut = self._pool.submit(
+            _run_job, job_id, video, location, self.options, self._status, self._cancel
+        )
+        # a job cancelled while queued never runs _run_job, which would delete the spool
+        fut.add_done_callback(lambda f: f.cancelled() and _discard(video))
+        self._futures[job_id] = fut
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        st = dict(self._status[job_id])
+        fut = self._futures.get(job_id)
+        # a crashed worker process never reports back
+        if fut and fut.done() and st['state'] in (QUEUED, RUNNING):
+            exc = None if fut.cancelled() else fut.exception()
+            st['state'] = CANCELLED if fut.cancelled() else FAILED
+            st['error'] = repr(exc) if exc else st['error']
+            self._status[job_id] = st
+        return st
+
+    def jobs(self) -> list[dict]:
+        """All jobs, newest first."""
+        return sorted((self.status(j) for j in self._status.keys()),
+                      key=lambda s: s['submitted'], reverse=True)
+
+    def cancel(self, job_id: str):
+        """Cancels a queued job, or asks a running one to stop."""
+        self._cancel[job_id] = True
+        fut = self._futures.get(job_id)
+        if fut and fut.cancel():
+            self._status[job_id] = {**self._status[job_id], 'state': CANCELLED,
+                                    'finished': datetime.now().isoformat()}
+
+    def active(self) -> bool:
+        return any(s['state'] in (QUEUED, RUNNING) for s in self.jobs())
+
+    def shutdown(self):
+        for job_id in list(self._futures):
+            self.cancel(job_id)
+        self._pool.shutdown(wait=True)
+        self._manager.shutdown()
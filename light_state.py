@@ -0,0 +1,189 @@
+# light_state.py
+
+from collections import Counter, deque
+
+import cv2
+import numpy as np
+
+from array_tracker import iou_matrix
+
+COLORS = ('red', 'yellow', 'green')
+PATCH_W, PATCH_H = 12, 24
+
+# hue ranges on OpenCV's 0-179 scale; red wraps around 0
+_HUE = {
+    'red': ((0, 10), (160, 179)),
+    'yellow': ((15, 35),),
+    'green': ((40, 95),),
+}
+
+
+def classify_heads(frame, boxes, min_lit: float = 0.03) -> list[str | None]:
+    """
+    Colour of every signal head in `boxes` (xyxy, frame coordinates) in one
+    pass: the crops are resized to a common patch, stacked into a single
+    image for one HSV conversion, and lit pixels are counted per hue range
+    with array ops. Heads with fewer than `min_lit` lit pixels give None.
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    if not len(boxes):
+        return []
+    h, w = frame.shape[:2]
+    patches = np.zeros((len(boxes), PATCH_H, PATCH_W, 3), dtype=np.uint8)
+    valid = np.zeros(len(boxes), dtype=bool)
+    for i, (x1, y1, x2, y2) in enumerate(boxes.astype(int)):
+        x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+        if x2 > x1 and y2 > y1:
+            patches[i] = cv2.resize(frame[y1:y2, x1:x2], (PATCH_W, PATCH_H),
+                                    interpolation=cv2.INTER_AREA)
+            valid[i] = True
+
+    hsv = cv2.cvtColor(patches.reshape(-1, PATCH_W, 3), cv2.COLOR_BGR2HSV).reshape(patches.shape)
+    hue = hsv[..., 0]
+    lit = (hsv[..., 1] >= 100) & (hsv[..., 2] >= 120)
+    counts = np.stack([
+        (lit & np.logical_or.reduce([(hue >= lo) & (hue <= hi) for lo, hi in _HUE[c]])).sum(axis=(1, 2))
+        for c in COLORS
+    ], axis=1)
+    best = counts.argmax(axis=1)
+    enough = valid & (counts.max(axis=1) >= min_lit * PATCH_W * PATCH_H)
+    return [COLORS[b] if ok else None for b, ok in zip(best, enough)]
+
+
+def _thirds(frame, box, step: int = 4) -> np.ndarray:
+    """Mean colour of the top/middle/bottom third of `box`, subsampled."""
+    h, w = frame.shape[:2]
+    x1, y1 = max(int(box[0]), 0), max(int(box[1]), 0)
+    x2, y2 = min(int(box[2]), w), min(int(box[3]), h)
+    crop = frame[y1:y2:step, x1:x2:step]
+    if not crop.size:
+        return np.zeros((3, 3))
+    return np.array([p.reshape(-1, p.shape[-1]).mean(axis=0) if p.size else np.zeros(p.shape[-1])
+                     for p in np.array_split(crop, 3, axis=0)])
+
+
+class _Head:
+    def __init__(self, box):
+        self.box = box
+        self.state = None
+        self.candidate = None
+        self.run = 0
+        self.stable = 0
+        self.missing = 0
+        self.since_check = 0
+        self.thirds = None
+        self.history = deque()
+
+
+class LightState:
+    """
+    Tracks every signal head across frames and smooths its colour.
+
+    A head only turns red after red has been read `confirm` times in a row,
+    so a single misread frame can't cause a violation; leaving red takes
+    `release` reads (default 1), so doubtful frames fall on the side of not
+    fining.
+    Classification is skipped for heads whose state has been stable for
+    `confirm` reads, whose box hasn't moved and whose lamp colours haven't
+    changed, with a forced re-read every `max_skip` frames.
+
+    `update` returns the scene's light: the most common confirmed state
+    among the heads, ties going to the largest head. `red_pending` tells
+    callers that red may be about to be confirmed, so events in those
+    frames can be held rather than dropped.
+    """
+    def __init__(self, classifier=classify_heads, confirm: int = 3, release: int = 1,
+                 history: int = 15, max_skip: int = 10, change_threshold: float = 12.0,
+                 max_missing: int = 30, match_iou: float = 0.3, moved_iou: float = 0.8):
+        self.classifier = classifier
+        self.confirm = confirm
+        self.release = release
+        self.history = history
+        self.max_skip = max_skip
+        self.change_threshold = change_threshold
+        self.max_missing = max_missing
+        self.match_iou = match_iou
+        self.moved_iou = moved_iou
+        self.heads: list[_Head] = []
+        self.classified = 0
+        self.skipped = 0
+
+    def _match(self, boxes):
+        """Pairs `boxes` with known heads by IoU; returns (head, moved) per box."""
+        pairs = [None] * len(boxes)
+        if self.heads and len(boxes):
+            iou = iou_matrix(np.array([hd.box for hd in self.heads]), boxes)
+            for flat in np.argsort(-iou, axis=None):
+                hi, bi = divmod(int(flat), iou.shape[1])
+                if iou[hi, bi] < self.match_iou:
+                    break
+                if pairs[bi] is None and all(p is None or p[0] is not self.heads[hi] for p in pairs):
+                    pairs[bi] = (self.heads[hi], iou[hi, bi] < self.moved_iou)
+        for bi, p in enumerate(pairs):
+            if p is None:
+                head = _Head(boxes[bi])
+                self.heads.append(head)
+                pairs[bi] = (head, True)
+        return pairs
+
+    def _observe(self, head, color):
+        head.history.append(color)
+        if len(head.history) > self.history:
+            head.history.popleft()
+        if color == head.state:
+            head.candidate, head.run = None, 0
+            head.stable += 1
+            return
+        if color == head.candidate:
+            head.run += 1
+        else:
+            head.candidate, head.run = color, 1
+        needed = self.confirm if color == 'red' else self.release
+        # the first reading of a new head is taken as is, unless it's red
+        if head.run >= needed or head.state is None and not head.stable and color != 'red':
+            head.state, head.candidate, head.run, head.stable = color, None, 0, 1
+
+    def update(self, frame, boxes) -> str | None:
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        seen = set()
+        todo = []
+        for box, (head, moved) in zip(boxes, self._match(boxes)):
+            seen.add(id(head))
+            head.box, head.missing = box, 0
+            thirds = _thirds(frame, box)
+            unchanged = (head.thirds is not None
+                         and np.abs(thirds - head.thirds).max() < self.change_threshold)
+            if (not moved and unchanged and head.candidate is None
+                    and head.stable >= self.confirm and head.since_check < self.max_skip):
+                head.since_check += 1
+                self.skipped += 1
+                continue
+            head.thirds = thirds
+            head.since_check = 0
+            todo.append(head)
+
+        if todo:
+            colors = self.classifier(frame, np.array([hd.box for hd in todo]))
+            self.classified += len(todo)
+            for head, color in zip(todo, colors):
+                self._observe(head, color)
+
+        for head in self.heads:
+            if id(head) not in seen:
+                head.missing += 1
+        self.heads = [hd for hd in self.heads if hd.missing <= self.max_missing]
+        return self.current()
+
+    def red_pending(self) -> bool:
+        """True while some head has read red but not yet `confirm` times."""
+        return any(hd.candidate == 'red' for hd in self.heads)
+
+    def current(self) -> str | None:
+        confirmed = [hd for hd in self.heads if hd.state is not None]
+        if not confirmed:
+            return None
+        votes = Counter(hd.state for hd in confirmed)
+        top = max(votes.values())
+        tied = {c for c, n in votes.items() if n == top}
+        area = lambda hd: (hd.box[2] - hd.box[0]) * (hd.box[3] - hd.box[1])
+        return max((hd for hd in confirmed if hd.state in tied), key=area).state
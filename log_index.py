@@ -0,0 +1,177 @@
+# log_index.py
+"""
+Indexed SQLite copy of the violation log, for paged log views.
+
+Rows appended to the CSV since the last sync are copied over in blocks, and
+queries filter, sort and page inside SQLite using indexes on timestamp,
+city and plate, so the first page of a multi-million-row log comes back in
+milliseconds. Exports stream the matching rows out in chunks.
+
+Usage (sync and print the newest violations):
+    python log_index.py violations.csv
+"""
+import csv
+import io
+import sqlite3
+import sys
+
+import pandas as pd
+
+import csv_tail
+from violation_sink import VIOLATION_FIELDS
+
+LOG_INDEX = 'violation_index.sqlite'
+SORTABLE = ('timestamp', 'city', 'plate')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS violations (
+    id          INTEGER PRIMARY KEY,
+    timestamp   TEXT NOT NULL,
+    city        TEXT NOT NULL,
+    plate       TEXT NOT NULL,
+    light_color TEXT,
+    snapshot    TEXT,
+    clip        TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_violations_ts ON violations (timestamp);
+CREATE INDEX IF NOT EXISTS ix_violations_city_ts ON violations (city, timestamp);
+CREATE INDEX IF NOT EXISTS ix_violations_plate ON violations (plate);
+"""
+
+
+def _prefix_bounds(prefix: str) -> tuple[str, str]:
+    """[lo, hi) range of strings starting with `prefix`, for an index range scan."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class LogIndex:
+    """
+    Query layer over the violation log. Each call opens its own connection,
+    so one instance can be shared by threads and several processes can use
+    the same file.
+    """
+    def __init__(self, path: str = LOG_INDEX):
+        self.path = path
+        with self._connect() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript(_SCHEMA + csv_tail.SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def sync(self, csv_path: str) -> int:
+        """
+        Copies rows appended to `csv_path` since the last sync; a truncated
+        or different CSV is re-indexed from scratch. Returns rows added.
+        """
+        def reset(con):
+            # the index holds one log: a new or truncated CSV replaces it
+            con.execute('DELETE FROM violations')
+            con.execute("DELETE FROM tail_state WHERE name = 'violations'")
+
+        def consume(con, df):
+            df = df.reindex(columns=VIOLATION_FIELDS).fillna('')
+            df['plate'] = df['plate'].str.upper()
+            con.executemany(
+                f"INSERT INTO violations ({','.join(VIOLATION_FIELDS)}) "
+                f"VALUES ({','.join('?' * len(VIOLATION_FIELDS))})",
+                zip(*(df[c].tolist() for c in VIOLATION_FIELDS)),
+            )
+
+        con = self._connect()
+        try:
+            return csv_tail.sync_tail(con, 'violations', csv_path, consume, reset,
+                                      keep_default_na=False)
+        finally:
+            con.close()
+
+    def _where(self, city=None, start=None, end=None, plate_prefix=None):
+        clauses, args = [], []
+        if city is not None:
+            clauses.append('city = ?')
+            args.append(city)
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            args.append(pd.Timestamp(start).isoformat())
+        if end is not None:
+            # whole end day, like the dashboard's date filters
+            clauses.append('timestamp < ?')
+            args.append((pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).isoformat())
+        if plate_prefix:
+            lo, hi = _prefix_bounds(plate_prefix.strip().upper())
+            clauses.append('plate >= ? AND plate < ?')
+            args += [lo, hi]
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', args
+
+    def count(self, city=None, start=None, end=None, plate_prefix=None) -> int:
+        where, args = self._where(city, start, end, plate_prefix)
+        with self._connect() as con:
+            return con.execute(f'SELECT COUNT(*) FROM violations{where}', args).fetchone()[0]
+
+    def _select(self, sort, descending):
+        if sort not in SORTABLE:
+            raise ValueError(f'cannot sort by {sort!r}')
+        direction = 'DESC' if descending else 'ASC'
+        # tie-breakers follow the index columns so SQLite can walk an index
+        # instead of sorting; id keeps pages stable
+        keys = {'timestamp': ('timestamp', 'id'), 'city': ('city', 'timestamp', 'id'),
+                'plate': ('plate', 'id')}[sort]
+        order = ', '.join(f'{k} {direction}' for k in keys)
+        return f'SELECT {",".join(VIOLATION_FIELDS)} FROM violations', f' ORDER BY {order}'
+
+    def page(self, city=None, start=None, end=None, plate_prefix=None,
+             sort: str = 'timestamp', descending: bool = True,
+             page: int = 0, page_size: int = 100) -> pd.DataFrame:
+        """Rows `page * page_size` onwards of the filtered, sorted log."""
+        where, args = self._where(city, start, end, plate_prefix)
+        select, order = self._select(sort, descending)
+        with self._connect() as con:
+            return pd.read_sql_query(f'{select}{where}{order} LIMIT ? OFFSET ?', con,
+                                     params=args + [page_size, page * page_size])
+
+    def iter_csv(self, city=None, start=None, end=None, plate_prefix=None,
+                 sort: str = 'timestamp', descending: bool = False, chunk_rows: int = 50_000,
+                 limit: int | None = None):
+        """
+        Yields the filtered log as CSV text, header first, `chunk_rows` rows
+        at a time; at most `limit` rows if given.
+        """
+        where, args = self._where(city, start, end, plate_prefix)
+        select, order = self._select(sort, descending)
+        if limit is not None:
+            order += ' LIMIT ?'
+            args = args + [limit]
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(VIOLATION_FIELDS)
+        with self._connect() as con:
+            cur = con.execute(f'{select}{where}{order}', args)
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+
+    def export_csv(self, dest: str, **query) -> int:
+        """Streams the filtered log to `dest`; returns bytes written."""
+        written = 0
+        with open(dest, 'w', newline='') as f:
+            for chunk in self.iter_csv(**query):
+                written += f.write(chunk)
+        return written
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else 'violations.csv'
+    index = LogIndex()
+    print(f'Indexed {index.sync(csv_path)} new rows')
+    print(index.page(page_size=20).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
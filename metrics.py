@@ -0,0 +1,248 @@
+# metrics.py
+"""
+Always-on instrumentation for running analyses.
+
+A `Metrics` object is a `profiling.StageTimer` with a location/camera
+label, violations-per-minute and sampled gauges (dropped frames, queue
+depths). Pass it to `analyze_frames(timer=...)`. Live metrics of the
+current process are exported by
+
+- `JsonlSink`: appends a snapshot of each analysis every few seconds to
+  metrics/metrics.jsonl, which the Streamlit operations page reads;
+- `serve_prometheus`: Prometheus text format on a local port.
+
+Usage:
+    metrics.start_exporters(port=9108)
+    with Metrics('Harare', camera='cam-1') as m:
+        analyze_video('clip.mp4', 'Harare', ..., timer=m)
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from profiling import StageTimer
+
+METRICS_JSONL = os.path.join('metrics', 'metrics.jsonl')
+EXPORT_INTERVAL = 5.0
+
+# Metrics of analyses running in this process
+_live: dict[int, 'Metrics'] = {}
+_live_lock = threading.Lock()
+_sink = None
+_server = None
+
+
+class Metrics(StageTimer):
+    """
+    Stage timings and event counts of one analysis, labelled by location
+    and camera. Keeps only the last `latency_window` frame latencies and
+    `window` seconds of violations, so it can stay on indefinitely.
+    """
+    def __init__(self, location: str, camera: str = '', window: float = 60.0,
+                 latency_window: int = 2048):
+        super().__init__()
+        self.location = location
+        self.camera = camera
+        self.window = window
+        self.latencies = deque(maxlen=latency_window)
+        self.state = 'running'
+        self.created = time.time()
+        self._violation_times = deque()
+        self._gauges = {}
+        with _live_lock:
+            _live[id(self)] = self
+
+    def count(self, name: str, n: int = 1):
+        super().count(name, n)
+        if name == 'violations':
+            with self._lock:
+                self._violation_times.append(time.monotonic())
+
+    def gauge(self, name: str, fn):
+        """Registers `fn()` to be sampled as gauge `name` at export time."""
+        self._gauges[name] = fn
+
+    def violations_per_minute(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            while self._violation_times and now - self._violation_times[0] > self.window:
+                self._violation_times.popleft()
+            recent = len(self._violation_times)
+        span = min(self.window, max(time.time() - self.created, 1.0))
+        return recent * 60.0 / span
+
+    def snapshot(self) -> dict:
+        snap = self.report()
+        snap.update({
+            'timestamp': time.time(),
+            'location': self.location,
+            'camera': self.camera,
+            'state': self.state,
+            'pid': os.getpid(),
+            'violations_per_minute': round(self.violations_per_minute(), 3),
+            'queue_depths': [q.qsize() for q in self.queues],
+            'gauges': {},
+        })
+        for name, fn in list(self._gauges.items()):
+            try:
+                snap['gauges'][name] = fn()
+            except Exception:
+                pass
+        return snap
+
+    def close(self, state: str = 'finished'):
+        """Marks the analysis ended, exports it one last time and unregisters it."""
+        self.state = state
+        if _sink:
+            _sink.write([self])
+        with _live_lock:
+            _live.pop(id(self), None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close('failed' if exc_type else 'finished')
+
+
+def live() -> list[Metrics]:
+    with _live_lock:
+        return list(_live.values())
+
+
+class JsonlSink:
+    """
+    Appends one JSON line per live analysis every `interval` seconds.
+    Each line goes out in a single write, so several processes can share
+    the file. It is rotated to `<path>.1` once it exceeds `max_bytes`.
+    """
+    def __init__(self, path: str = METRICS_JSONL, interval: float = EXPORT_INTERVAL,
+                 max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='metrics-jsonl', daemon=True)
+        self._thread.start()
+
+    def write(self, metrics):
+        lines = ''.join(json.dumps(m.snapshot()) + '\n' for m in metrics)
+        if not lines:
+            return
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+        except OSError:
+            pass
+        with open(self.path, 'a') as f:
+            f.write(lines)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write(live())
+            except Exception as exc:
+                print(f'metrics export failed: {exc}')
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+_QUANTILES = {'p50': '0.5', 'p99': '0.99'}
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(metrics=None) -> str:
+    """Renders `metrics` (default: all live analyses) in Prometheus text format."""
+    metrics = live() if metrics is None else metrics
+    families: dict[str, tuple[str, list[str]]] = {}
+
+    def add(name, kind, labels, value):
+        lbl = ','.join(f'{k}="{_label(v)}"' for k, v in labels.items())
+        families.setdefault(name, (kind, []))[1].append(f'tvs_{name}{{{lbl}}} {value}')
+
+    for m in metrics:
+        snap = m.snapshot()
+        base = {'location': m.location, 'camera': m.camera}
+        add('frames_total', 'counter', base, snap['frames'])
+        add('fps', 'gauge', base, snap['fps'])
+        add('violations_per_minute', 'gauge', base, snap['violations_per_minute'])
+        for q, ms in snap['latency_ms'].items():
+            add('frame_latency_seconds', 'summary', {**base, 'quantile': _QUANTILES[q]}, ms / 1000)
+        for stage, st in snap['stages'].items():
+            add('stage_seconds_total', 'counter', {**base, 'stage': stage}, st['seconds'])
+            add('stage_calls_total', 'counter', {**base, 'stage': stage}, st['calls'])
+        for event, n in snap['counters'].items():
+            add('events_total', 'counter', {**base, 'event': event}, n)
+        for i, depth in enumerate(snap['queue_depths']):
+            add('queue_depth', 'gauge', {**base, 'queue': i}, depth)
+        for name, value in snap['gauges'].items():
+            add(name, 'gauge', base, value)
+
+    out = []
+    for name, (kind, lines) in families.items():
+        out.append(f'# TYPE tvs_{name} {kind}')
+        out.extend(lines)
+    return '\n'.join(out) + '\n'
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_prometheus(port: int = 9108, host: str = '127.0.0.1'):
+    """Serves /metrics on a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _PrometheusHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def start_exporters(jsonl: str | None = METRICS_JSONL, port: int | None = None,
+                    interval: float = EXPORT_INTERVAL):
+    """Starts this process's exporters once; later calls are no-ops."""
+    global _sink, _server
+    if jsonl and _sink is None:
+        _sink = JsonlSink(jsonl, interval)
+    if port and _server is None:
+        _server = serve_prometheus(port)
+
+
+def read_latest(path: str = METRICS_JSONL, max_bytes: int = 1024 * 1024) -> list[dict]:
+    """
+    Latest snapshot per (location, camera, pid) from the tail of the JSONL
+    file, newest first.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - max_bytes, 0))
+        tail = f.read().decode(errors='replace').splitlines()
+    latest = {}
+    for line in tail:
+        try:
+            snap = json.loads(line)
+        except ValueError:
+            continue  # partial first line of the tail
+        latest[(snap['location'], snap['camera'], snap['pid'])] = snap
+    return sorted(latest.values(), key=lambda s: s['timestamp'], reverse=True)
@@ -0,0 +1,87 @@
+# model_registry.py
+"""
+One lazily loaded, warmed-up instance of each YOLO model per process.
+
+Nothing here imports torch or ultralytics until a model is first requested,
+so processes that never run inference (the dashboards) don't pay for them.
+
+Set TVS_MODEL_FORMAT=onnx or TVS_MODEL_FORMAT=openvino to prefer a CPU
+export next to the .pt weights when one exists; create it with
+    python model_registry.py export onnx
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+
+VEHICLE_WEIGHTS = 'yolov8n.pt'
+PLATE_WEIGHTS = 'license-plate-finetune-v1x.pt'
+MODEL_FORMAT = os.environ.get('TVS_MODEL_FORMAT', 'pt')
+EXPORT_BATCH = 16        # largest batch an exported model is traced for
+
+_models = {}
+_lock = threading.Lock()
+
+
+def exported_path(weights: str, fmt: str) -> str:
+    """Where ultralytics writes the `fmt` export of `weights`."""
+    stem = os.path.splitext(weights)[0]
+    if fmt == 'openvino':
+        return f'{stem}_openvino_model'
+    return f'{stem}.{fmt}'
+
+
+def resolve_weights(weights: str, fmt: str | None = None) -> str:
+    """The exported model for `fmt` if present, else `weights` itself."""
+    fmt = fmt or MODEL_FORMAT
+    if fmt != 'pt':
+        path = exported_path(weights, fmt)
+        if os.path.exists(path):
+            return path
+    return weights
+
+
+def get_model(weights: str, fmt: str | None = None, warmup: bool = True, imgsz: int = 640):
+    """
+    Returns the process-wide model for `weights`, loading it on first use
+    and running one dummy inference so the first real frame isn't slow.
+    """
+    path = resolve_weights(weights, fmt)
+    model = _models.get(path)
+    if model is not None:
+        return model
+    with _lock:
+        if path not in _models:
+            from ultralytics import YOLO
+            model = YOLO(path, task='detect')
+            if warmup:
+                model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+            _models[path] = model
+    return _models[path]
+
+
+def preload(*weights: str):
+    """Loads and warms up several models, e.g. when a worker starts."""
+    for w in weights or (VEHICLE_WEIGHTS, PLATE_WEIGHTS):
+        get_model(w)
+
+
+def export(fmt: str, *weights: str, batch: int = EXPORT_BATCH) -> list[str]:
+    """
+    Exports `weights` (default: both models) to `fmt` for CPU inference and
+    returns the exported paths. Exports take a dynamic batch dimension, up
+    to `batch`, since frames and plate crops are sent in batches; exports
+    made with a fixed batch of 1 need to be redone.
+    """
+    from ultralytics import YOLO
+    return [YOLO(w).export(format=fmt, dynamic=True, batch=batch)
+            for w in weights or (VEHICLE_WEIGHTS, PLATE_WEIGHTS)]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 3 and sys.argv[1] == 'export':
+        for path in export(sys.argv[2], *sys.argv[3:]):
+            print(path)
+    else:
+        print('usage: python model_registry.py export {onnx|openvino} [weights ...]')
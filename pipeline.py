@@ -0,0 +1,111 @@
+# pipeline.py
+
+import queue
+import threading
+
+# Marks the end of the stream on every queue
+_DONE = object()
+
+
+class _StageError:
+    """Carries an exception raised inside a worker thread to the consumer."""
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def iter_stages(source, stages):
+    """
+    Applies `stages` to every item of `source` one after another on the
+    calling thread. Same contract as `run_pipeline`, without threads.
+    """
+    for item in source:
+        for stage in stages:
+            item = stage(item)
+        yield item
+
+
+def run_pipeline(source, stages, maxsize: int = 4, monitor=None):
+    """
+    Runs `source` and each callable in `stages` on its own thread, connected
+    by bounded queues, and yields the output of the last stage.
+
+    Every stage has exactly one thread and every queue is FIFO, so items come
+    out in the same order they were produced. Throughput approaches that of
+    the slowest stage instead of the sum of all stages.
+
+    Args:
+        source: iterable producing the input items (e.g. decoded frames)
+        stages: callables applied in order, each taking the previous output
+        maxsize: capacity of each inter-stage queue (bounds memory use)
+        monitor: optional callable given the list of queues, e.g. to
+            report their depth
+
+    Yields:
+        output of the last stage, in source order
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=maxsize) for _ in range(len(stages) + 1)]
+    if monitor:
+        monitor(queues)
+
+    def put(q, item):
+        # blocking put that gives up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except Exception as exc:
+            put(queues[0], _StageError(exc))
+            return
+        put(queues[0], _DONE)
+
+    def work(stage, q_in, q_out):
+        while True:
+            item = q_in.get()
+            if item is _DONE or isinstance(item, _StageError):
+                put(q_out, item)
+                return
+            try:
+                out = stage(item)
+            except Exception as exc:
+                put(q_out, _StageError(exc))
+                return
+            if not put(q_out, out):
+                return
+
+    threads = [threading.Thread(target=produce, name='pipeline-source', daemon=True)]
+    for i, stage in enumerate(stages):
+        threads.append(threading.Thread(
+            target=work, args=(stage, queues[i], queues[i + 1]),
+            name=f'pipeline-stage-{i}', daemon=True
+        ))
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        # unblock any stage still waiting on an upstream queue
+        for q in queues:
+            try:
+                q.put_nowait(_DONE)
+            except queue.Full:
+                pass
+        for t in threads:
+            t.join(timeout=1.0)
@@ -0,0 +1,32 @@
+# plate_locator.py
+
+from model_registry import EXPORT_BATCH
+
+
+class PlateLocator:
+    """
+    Finds licence plates inside vehicle crops by running the plate model on
+    the crops rather than the full frame, in batches. A plate is only ever
+    looked for inside a vehicle's own box, so one car can't be logged with
+    another car's plate.
+    """
+    def __init__(self, plate_model):
+        self.model = plate_model
+
+    def locate_crops(self, crops):
+        """
+        Runs the plate model on `crops` in batches of up to `EXPORT_BATCH`
+        (the most an exported model takes) and returns the most confident
+        plate bbox in each crop's own coordinates, or None.
+        """
+        crops = list(crops)
+        out = []
+        for i in range(0, len(crops), EXPORT_BATCH):
+            for res in self.model(crops[i:i + EXPORT_BATCH], verbose=False):
+                plate = None
+                if len(res.boxes):
+                    # boxes come sorted by confidence
+                    plate = tuple(map(int, res.boxes.xyxy[0].cpu().numpy()))
+                out.append(plate)
+        return out
+
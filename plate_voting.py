@@ -0,0 +1,133 @@
+# plate_voting.py
+
+from collections import Counter
+
+import cv2
+import numpy as np
+
+
+def focus_score(img) -> float:
+    """Variance of the Laplacian: higher means sharper."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if gray.shape[1] > 160:
+        gray = cv2.resize(gray, (160, max(int(gray.shape[0] * 160 / gray.shape[1]), 1)))
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def average_hash(img, size: int = 8) -> int:
+    """Perceptual (average) hash of an image, `size`² bits."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+    bits = (small > small.mean()).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def vote(texts: list[str]) -> str | None:
+    """
+    Consensus of several OCR reads, sharpest first. Reads of the most common
+    length are combined character by character; ties go to the sharper read.
+    """
+    texts = [t.strip().upper() for t in texts if t and t.strip()]
+    if not texts:
+        return None
+    length = Counter(len(t) for t in texts).most_common(1)[0][0]
+    same = [t for t in texts if len(t) == length]
+    return ''.join(Counter(chars).most_common(1)[0][0] for chars in zip(*same))
+
+
+def _clip(frame, box):
+    h, w = frame.shape[:2]
+    x1, y1 = max(int(box[0]), 0), max(int(box[1]), 0)
+    x2, y2 = min(int(box[2]), w), min(int(box[3]), h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return frame[y1:y2, x1:x2]
+
+
+class PlateVoter:
+    """
+    Collects the sharpest vehicle crops of each track while it approaches
+    the stop line, and on a violation reads the plate from the best `ocr_top`
+    of them instead of only the (often blurred) crossing frame.
+
+    Plate localisation for all candidates runs as one batch. OCR goes
+    sharpest first and stops as soon as two reads agree; results are
+    memoized by (track id, perceptual hash of the plate crop), so crops
+    within `hash_bits` differing hash bits of one already read share that
+    read instead of running OCR again.
+    """
+    def __init__(self, locator, reader, keep: int = 4, ocr_top: int = 3, hash_bits: int = 4):
+        self.locator = locator
+        self.reader = reader
+        self.keep = keep
+        self.ocr_top = ocr_top
+        self.hash_bits = hash_bits
+        self._crops: dict[int, list[tuple[float, np.ndarray]]] = {}
+        self._ocr: dict[int, list[tuple[int, str | None]]] = {}
+
+    def observe(self, track_id: int, frame, vehicle_box):
+        """Offers the track's current vehicle crop as a candidate."""
+        crop = _clip(frame, vehicle_box)
+        if crop is None:
+            return
+        score = focus_score(crop)
+        kept = self._crops.setdefault(track_id, [])
+        if len(kept) < self.keep:
+            kept.append((score, crop.copy()))
+        else:
+            worst = min(range(len(kept)), key=lambda i: kept[i][0])
+            if score > kept[worst][0]:
+                kept[worst] = (score, crop.copy())
+
+    def read(self, violators):
+        """
+        Reads plates for `violators`, a list of (track_id, frame, vehicle_box).
+        Returns one (plate_text or None, plate_image or None) per violator.
+        """
+        for tid, frame, vb in violators:
+            if vb is not None:
+                self.observe(tid, frame, vb)
+
+        # one batched plate-localisation pass over every candidate crop
+        cands = [(tid, crop) for tid, _, _ in violators for _, crop in self._crops.get(tid, [])]
+        plates = self.locator.locate_crops([c for _, c in cands])
+
+        by_track: dict[int, list[tuple[float, np.ndarray]]] = {}
+        for (tid, crop), pb in zip(cands, plates):
+            img = _clip(crop, pb) if pb else None
+            if img is not None:
+                by_track.setdefault(tid, []).append((focus_score(img), img))
+
+        out = []
+        for tid, _, _ in violators:
+            found = sorted(by_track.get(tid, []), key=lambda p: p[0], reverse=True)
+            if not found:
+                out.append((None, None))
+                continue
+            texts, seen = [], set()
+            for _, img in found[:self.ocr_top]:
+                text = self._ocr_read(tid, img)
+                texts.append(text)
+                key = (text or '').strip().upper()
+                if key and key in seen:
+                    break   # two reads agree
+                seen.add(key)
+            out.append((vote(texts), found[0][1]))
+        return out
+
+    def _ocr_read(self, track_id: int, img) -> str | None:
+        """OCR of `img`, reusing the read of a near-identical crop of the same track."""
+        h = average_hash(img)
+        memo = self._ocr.setdefault(track_id, [])
+        for known, text in memo:
+            if bin(known ^ h).count('1') <= self.hash_bits:
+                return text
+        text = self.reader(img, (0, 0, img.shape[1], img.shape[0]))
+        memo.append((h, text))
+        return text
+
+    def evict(self, track_ids):
+        """Forgets crops and OCR results of tracks that have ended."""
+        for tid in track_ids:
+            self._crops.pop(tid, None)
+            self._ocr.pop(tid, None)
@@ -0,0 +1,104 @@
+# profiling.py
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimer:
+    """
+    Wall-clock time per pipeline stage plus per-frame latency, for
+    `analyze_frames(timer=...)`.
+
+    Stages can be timed from several threads at once (pipelined mode).
+    Latency runs from when a frame leaves the decoder to when the
+    violation logic has finished with it. `count` tallies events such as
+    violations; `watch_queues` receives the pipeline's inter-stage queues.
+    """
+    def __init__(self):
+        self.totals: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.latencies: list[float] = []
+        self.frames = 0
+        self.queues = []
+        self._entered = deque()
+        self._lock = threading.Lock()
+        self._started = None
+        self._finished = None
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.totals[stage] += seconds
+            self.calls[stage] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def watch_queues(self, queues):
+        self.queues = list(queues)
+
+    @contextmanager
+    def span(self, stage: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t)
+
+    def wrap(self, fn, stage: str):
+        """`fn` with every call timed as `stage`."""
+        def timed(*args, **kwargs):
+            with self.span(stage):
+                return fn(*args, **kwargs)
+        return timed
+
+    def source(self, frames):
+        """Yields `frames`, timing each fetch as 'decode' and stamping its entry."""
+        it = iter(frames)
+        self._started = time.perf_counter()
+        while True:
+            t = time.perf_counter()
+            try:
+                frame = next(it)
+            except StopIteration:
+                return
+            now = time.perf_counter()
+            self.add('decode', now - t)
+            self._entered.append(now)
+            yield frame
+
+    def sink(self, items):
+        """Yields `items`; a frame counts as done when the next one is requested."""
+        for item in items:
+            yield item
+            self._finished = time.perf_counter()
+            self.latencies.append(self._finished - self._entered.popleft())
+            self.frames += 1
+
+    def report(self) -> dict:
+        frames = self.frames
+        wall = (self._finished or 0) - (self._started or 0)
+        lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            'frames': frames,
+            'seconds': round(wall, 4),
+            'fps': round(frames / wall, 2) if wall > 0 else 0.0,
+            'latency_ms': {
+                'p50': round(float(np.percentile(lat, 50)), 3),
+                'p99': round(float(np.percentile(lat, 99)), 3),
+            },
+            'stages': {
+                name: {
+                    'seconds': round(self.totals[name], 4),
+                    'calls': self.calls[name],
+                    'ms_per_frame': round(self.totals[name] * 1000 / max(frames, 1), 3),
+                }
+                for name in sorted(self.totals)
+            },
+            'counters': dict(self.counters),
+        }
@@ -0,0 +1,85 @@
+# roi.py
+
+import numpy as np
+
+TILE_WIDTH = 640       # detector input size; tiles this wide aren't downscaled
+TILE_OVERLAP = 160     # shared by neighbouring tiles, so cut vehicles can be joined
+
+
+def stop_line_band(frame, stop_line_y: int, band: int):
+    """
+    Returns (crop, y0): the full-width strip of `frame` within `band` pixels
+    of the stop line, and its vertical offset.
+    """
+    h = frame.shape[0]
+    y0 = min(max(stop_line_y - band, 0), h - 1)
+    y1 = min(max(stop_line_y + band, y0 + 1), h)
+    return np.ascontiguousarray(frame[y0:y1]), y0
+
+
+def band_tiles(band, width: int = TILE_WIDTH, overlap: int = TILE_OVERLAP):
+    """
+    Splits `band` into windows about `width` pixels wide, overlapping by at
+    least `overlap`, and returns [(tile, x0)]. A detector letterboxing its
+    input to `width` then sees the band at native resolution instead of
+    shrinking the whole strip.
+    """
+    w = band.shape[1]
+    if w <= width:
+        return [(band, 0)]
+    n = -(-(w - overlap) // (width - overlap))
+    starts = np.linspace(0, w - width, n).round().astype(int)
+    return [(np.ascontiguousarray(band[:, x0:x0 + width]), int(x0)) for x0 in starts]
+
+
+def merge_tiles(tile_boxes, offsets, y0: int = 0, min_overlap: float = 0.5) -> np.ndarray:
+    """
+    Joins the (N,4) boxes detected on each tile into one set in frame
+    coordinates. Boxes of one vehicle seen by two tiles (whole in one and
+    cut in the other, or cut in both) overlap by at least `min_overlap` of
+    the smaller box and are replaced by their union.
+    """
+    boxes = [np.asarray(b, dtype=float).reshape(-1, 4) + (x0, y0, x0, y0)
+             for b, x0 in zip(tile_boxes, offsets)]
+    boxes = np.concatenate(boxes) if boxes else np.empty((0, 4))
+    if len(offsets) < 2 or not len(boxes):
+        return boxes
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    kept: list[np.ndarray] = []
+    for b in boxes[np.argsort(-area)]:
+        for k in kept:
+            iw = min(b[2], k[2]) - max(b[0], k[0])
+            ih = min(b[3], k[3]) - max(b[1], k[1])
+            smaller = min((b[2] - b[0]) * (b[3] - b[1]), (k[2] - k[0]) * (k[3] - k[1]))
+            if iw > 0 and ih > 0 and iw * ih >= min_overlap * smaller:
+                k[:2] = np.minimum(k[:2], b[:2])
+                k[2:] = np.maximum(k[2:], b[2:])
+                break
+        else:
+            kept.append(b.copy())
+    return np.array(kept).reshape(-1, 4)
+
+
+class LightLock:
+    """
+    Holds the traffic-light boxes found by a full-frame detection and only
+    asks for a new detection every `recheck_every` frames.
+
+    `needs_check` reserves the check when it says yes, so frames prepared
+    ahead of the detector (batched or pipelined) don't all ask for one
+    while the first check is still in flight.
+    """
+    def __init__(self, recheck_every: int = 30):
+        self.recheck_every = max(int(recheck_every), 1)
+        self.boxes = np.empty((0, 4))
+        self._checked_at = None
+
+    def needs_check(self, frame_idx: int) -> bool:
+        if self._checked_at is None or frame_idx - self._checked_at >= self.recheck_every:
+            self._checked_at = frame_idx
+            return True
+        return False
+
+    def update(self, tl_boxes):
+        """Locks onto `tl_boxes` (frame coordinates) from the latest check."""
+        self.boxes = np.asarray(tl_boxes, dtype=float).reshape(-1, 4)
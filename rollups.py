@@ -0,0 +1,153 @@
+# rollups.py
+"""
+Materialized rollups of violation counts and cars passed by
+(city, hour/day/week/month), kept in a small SQLite file.
+
+Rollups are synced from the CSV logs by byte offset, by analyze_video as it
+logs and by the dashboards before they read, so charts are served from a
+few thousand buckets instead of the raw history and every CSV row is
+counted exactly once. Each bucket row belongs to the CSV it came from, so
+several logs can feed one dataset without rebuilding each other's counts.
+
+Usage (bring the rollups up to date with the existing CSVs):
+    python rollups.py
+"""
+import os
+import sqlite3
+
+import pandas as pd
+
+import csv_tail
+
+ROLLUP_DB = 'rollups.sqlite'
+GRAINS = ('hour', 'day', 'week', 'month')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup (
+    dataset     TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    grain       TEXT NOT NULL,
+    city        TEXT NOT NULL,
+    bucket      TEXT NOT NULL,
+    violations  INTEGER NOT NULL DEFAULT 0,
+    cars_passed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dataset, grain, city, bucket, source)
+);
+"""
+
+_UPSERT = """
+INSERT INTO rollup (dataset, source, grain, city, bucket, violations, cars_passed)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dataset, grain, city, bucket, source) DO UPDATE SET
+    violations = violations + excluded.violations,
+    cars_passed = cars_passed + excluded.cars_passed
+"""
+
+
+def bucket_start(ts: pd.Series, grain: str) -> pd.Series:
+    """Start of the hour/day/week (Monday)/month containing each timestamp."""
+    if grain == 'hour':
+        return ts.dt.floor('h')
+    if grain == 'day':
+        return ts.dt.floor('D')
+    if grain == 'week':
+        return ts.dt.to_period('W').dt.start_time
+    if grain == 'month':
+        return ts.dt.to_period('M').dt.start_time
+    raise ValueError(f'unknown grain {grain!r}')
+
+
+class Rollups:
+    """
+    Rollups for two datasets: 'violations' (one row per violation, counted)
+    and 'fined' (per-run summaries, `violations`/`cars_passed` summed).
+    Each call opens its own connection, so instances can be shared with
+    writer threads and several processes can update the same file.
+    """
+    def __init__(self, path: str = ROLLUP_DB):
+        self.path = path
+        with self._connect() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            if 'source' not in {row[1] for row in con.execute('PRAGMA table_info(rollup)')}:
+                # older file without per-CSV ownership: rebuilt by the next sync
+                con.executescript('DROP TABLE IF EXISTS rollup; DROP TABLE IF EXISTS sync_state;')
+            con.executescript(_SCHEMA + csv_tail.SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _records(self, dataset: str, source: str, df: pd.DataFrame, city_col: str) -> list[tuple]:
+        if df.empty:
+            return []
+        base = pd.DataFrame({
+            'timestamp': pd.to_datetime(df['timestamp'], errors='coerce'),
+            'city': df[city_col].astype(str).values,
+            'violations': df['violations'].values if 'violations' in df else 1,
+            'cars_passed': df['cars_passed'].values if 'cars_passed' in df else 0,
+        }).dropna(subset=['timestamp'])
+        records = []
+        for grain in GRAINS:
+            agg = (base.assign(bucket=bucket_start(base['timestamp'], grain))
+                       .groupby(['city', 'bucket'])[['violations', 'cars_passed']].sum())
+            records += [(dataset, source, grain, city, bucket.isoformat(), int(v), int(c))
+                        for (city, bucket), (v, c) in zip(agg.index, agg.values)]
+        return records
+
+    def sync(self, dataset: str, csv_path: str, city_col: str = 'city') -> int:
+        """
+        Rolls up the rows appended to `csv_path` since it was last synced
+        into `dataset`. The byte offset is committed with the counts, so each
+        row is counted once however many processes sync. On the first sync,
+        or when the CSV was truncated, the counts from that CSV are rebuilt;
+        other CSVs' counts in the dataset are left alone. Returns rows added.
+        """
+        source = os.path.abspath(csv_path)
+
+        def reset(con):
+            con.execute('DELETE FROM rollup WHERE dataset = ? AND source = ?', (dataset, source))
+
+        def consume(con, df):
+            for col in ('violations', 'cars_passed'):
+                if col in df:
+                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+            con.executemany(_UPSERT, self._records(dataset, source, df, city_col))
+
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            return csv_tail.sync_tail(con, dataset, source, consume, reset)
+        finally:
+            con.close()
+
+    def series(self, dataset: str, grain: str, cities=None, start=None, end=None) -> pd.DataFrame:
+        """
+        Returns buckets of `grain` as a DataFrame with columns
+        bucket (datetime64), city, violations, cars_passed; optionally
+        restricted to `cities` and to buckets overlapping [start, end].
+        """
+        sql = ('SELECT bucket, city, SUM(violations) AS violations, '
+               'SUM(cars_passed) AS cars_passed FROM rollup WHERE dataset = ? AND grain = ?')
+        args = [dataset, grain]
+        if cities is not None:
+            cities = list(cities)
+            sql += f" AND city IN ({','.join('?' * len(cities))})"
+            args += cities
+        if start is not None:
+            sql += ' AND bucket >= ?'
+            args.append(bucket_start(pd.Series([pd.Timestamp(start)]), grain)[0].isoformat())
+        if end is not None:
+            sql += ' AND bucket <= ?'
+            args.append(pd.Timestamp(end).isoformat())
+        with self._connect() as con:
+            df = pd.read_sql_query(sql + ' GROUP BY bucket, city ORDER BY bucket', con, params=args)
+        df['bucket'] = pd.to_datetime(df['bucket'])
+        return df
+
+
+def main():
+    rollups = Rollups()
+    rollups.sync('violations', 'violations.csv')
+    rollups.sync('fined', 'fined.csv', city_col='location')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+# stream_analysis.py
+"""
+Live red-light analysis straight from a camera or RTSP stream.
+
+Frames go from the capture into the violation pipeline without recording
+first. If the analyzer falls behind, stale frames are dropped so latency
+stays bounded. Recording is optional and runs on its own writer thread.
+
+Usage:
+    python stream_analysis.py 0 --location Harare
+    python stream_analysis.py rtsp://cam/stream --location Gweru --record out.mp4
+    python stream_analysis.py clip.mp4 --location Kadoma --loop   # stand-in source
+"""
+import argparse
+import queue
+import threading
+import time
+
+import cv2
+
+
+def open_capture(source, width: int | None = None, height: int | None = None):
+    """Opens a camera index (int or digit string), RTSP URL or file."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if not cap.isOpened():
+        raise IOError(f'cannot open video source {source!r}')
+    return cap
+
+
+class FrameRecorder:
+    """
+    Writes frames to a video file on a separate thread. Frames are dropped
+    rather than queued without bound if the disk can't keep up.
+    """
+    def __init__(self, path: str, fps: float = 20.0, max_pending: int = 64):
+        self.path = path
+        self.fps = fps
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name='frame-recorder', daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        out = None
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if out is None:
+                h, w = frame.shape[:2]
+                out = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (w, h))
+            out.write(frame)
+        if out is not None:
+            out.release()
+
+
+class LatestFrameReader:
+    """
+    Reads a capture continuously on its own thread and hands out only the
+    newest frame; frames the consumer didn't pick up in time are counted in
+    `dropped`. Iterating blocks until a new frame arrives and ends when the
+    source does.
+
+    File sources are paced at their native fps so they behave like a live
+    camera; with `loop=True` they restart at the end.
+    """
+    def __init__(self, cap, loop: bool = False, recorder: FrameRecorder | None = None):
+        self.cap = cap
+        self.loop = loop
+        self.recorder = recorder
+        self.captured = 0
+        self.dropped = 0
+        self._frame = None
+        self._closed = False
+        self._cond = threading.Condition()
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        # cameras and streams report no frame count; files need pacing
+        self._interval = 1.0 / fps if frame_count > 0 else 0.0
+        self._thread = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_at = time.perf_counter()
+        while not self._closed:
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.loop and self.captured:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+            if self.recorder:
+                self.recorder.write(frame)
+            with self._cond:
+                if self._frame is not None:
+                    self.dropped += 1
+                self._frame = frame
+                self.captured += 1
+                self._cond.notify()
+            if self._interval:
+                next_at += self._interval
+                time.sleep(max(next_at - time.perf_counter(), 0))
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while self._frame is None and not self._closed:
+                    self._cond.wait()
+                if self._frame is None:
+                    return
+                frame, self._frame = self._frame, None
+            yield frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
+
+
+def analyze_stream(
+    source,
+    location: str,
+    snapshot_dir: str = 'snapshots',
+    detailed_csv: str = 'violations.csv',
+    fined_csv: str = 'fined.csv',
+    record_path: str | None = None,
+    loop: bool = False,
+    duration: float | None = None,
+    width: int | None = None,
+    height: int | None = None,
+    should_stop=None,
+    camera: str | None = None,
+    **options,
+) -> tuple[int, int]:
+    """
+    Analyze a live source for red-light violations until it ends, `duration`
+    seconds pass or `should_stop()` returns True.
+
+    Args:
+        source: camera index, RTSP/HTTP URL or video file
+        location: city name for logs
+        snapshot_dir, detailed_csv, fined_csv: as for analyze_video
+        record_path: also record every captured frame to this file
+        loop: restart file sources at the end (for testing)
+        duration: stop after this many seconds
+        width, height: requested capture resolution
+        should_stop: optional callable polled by the analyzer; stopping
+            this way skips the summary row, like a cancelled job
+        camera: label for the live metrics; defaults to `source`
+        **options: other analyze_frames arguments; the pipeline queues
+            default to a single slot to keep latency low, and `fps` (for
+            evidence clips) to the rate the capture reports. Clips play at
+            the rate frames reach the analyzer, so frames the reader drops
+            don't speed them up
+
+    Returns:
+        (cars_passed, violations)
+    """
+    from download_weight import analyze_frames
+    import metrics
+
+    cap = open_capture(source, width, height)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    # some drivers report 0 or a timebase (e.g. 90000) instead of a frame rate
+    fps = fps if 1 <= fps <= 240 else 25.0
+    recorder = None
+    if record_path:
+        recorder = FrameRecorder(record_path, fps)
+    reader = LatestFrameReader(cap, loop=loop, recorder=recorder)
+
+    deadline = time.monotonic() + duration if duration else None
+    def frames():
+        # reaching the deadline ends the stream normally, so a summary is logged
+        for frame in reader:
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            yield frame
+
+    options.setdefault('queue_size', 1)
+    options.setdefault('fps', fps)
+    options.setdefault('realtime', True)
+    stream_metrics = metrics.Metrics(location, camera=camera or str(source))
+    stream_metrics.gauge('dropped_frames', lambda: reader.dropped)
+    stream_metrics.gauge('captured_frames', lambda: reader.captured)
+    if recorder:
+        stream_metrics.gauge('recorder_dropped_frames', lambda: recorder.dropped)
+    try:
+        with stream_metrics:
+            return analyze_frames(frames(), location, snapshot_dir, detailed_csv, fined_csv,
+                                  should_stop=should_stop, timer=stream_metrics, **options)
+    finally:
+        reader.close()
+        cap.release()
+        if recorder:
+            recorder.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Live red-light violation analysis')
+    ap.add_argument('source', help='camera index, RTSP URL or video file')
+    ap.add_argument('--location', required=True)
+    ap.add_argument('--record', help='also record the stream to this file')
+    ap.add_argument('--loop', action='store_true', help='loop file sources')
+    ap.add_argument('--duration', type=float, help='stop after N seconds')
+    ap.add_argument('--width', type=int)
+    ap.add_argument('--height', type=int)
+    ap.add_argument('--detect-scale', type=float, default=0.5)
+    ap.add_argument('--stop-line-y', type=int, default=700)
+    ap.add_argument('--pipelined', action='store_true')
+    ap.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this port')
+    args = ap.parse_args()
+
+    import metrics
+    metrics.start_exporters(port=args.metrics_port)
+
+    def report(p):
+        print(f"\r{p['frames']} frames · {p['fps']:.1f} fps · "
+              f"{p['cars_passed']} cars · {p['violations']} violations", end='')
+
+    try:
+        cars, viol = analyze_stream(
+            args.source, args.location, record_path=args.record, loop=args.loop,
+            duration=args.duration, width=args.width, height=args.height,
+            detect_scale=args.detect_scale, stop_line_y=args.stop_line_y,
+            pipelined=args.pipelined, progress=report,
+        )
+    except KeyboardInterrupt:
+        return
+    print(f'\n{args.location}: {cars} cars passed, {viol} violations')
+
+
+if __name__ == '__main__':
+    main()
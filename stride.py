@@ -0,0 +1,95 @@
+# stride.py
+
+import threading
+
+
+class DetectionStride:
+    """
+    Decides which frames go through the detector.
+
+    With a fixed stride, detection runs every `stride` frames. In adaptive
+    mode the stride drops to 1 whenever a tracked (or extrapolated) centroid
+    is within `band` pixels of the stop line, so crossings are always
+    evaluated on a freshly detected frame.
+
+    Decisions are taken ahead of the consumer (by `delay` frames), possibly
+    on another thread. The decision for frame i uses exactly the
+    observation of frame i - `delay`, waiting for it if the consumer is
+    behind, so the frames detected never depend on thread timing.
+    `delay` must be at least the number of frames prepared at once.
+    """
+    def __init__(self, stride: int = 1, adaptive: bool = False,
+                 stop_line_y: int = 700, band: int = 150, delay: int = 0):
+        self.stride = max(int(stride), 1)
+        self.adaptive = adaptive and self.stride > 1
+        self.stop_line_y = stop_line_y
+        self.band = band
+        self.delay = delay
+        self._near_line: dict[int, bool] = {}   # observed frame -> near the line
+        self._cond = threading.Condition()
+        self._closed = False
+        self._last_detect = None
+
+    def _near_line_at(self, frame_idx: int) -> bool:
+        ref = frame_idx - self.delay
+        if ref < 0:
+            return True   # dense until we know the scene
+        with self._cond:
+            self._cond.wait_for(lambda: ref in self._near_line or self._closed)
+            return self._near_line.pop(ref, True)
+
+    def should_detect(self, frame_idx: int) -> bool:
+        if (self.stride == 1 or self._last_detect is None
+                or (self.adaptive and self._near_line_at(frame_idx))
+                or frame_idx - self._last_detect >= self.stride):
+            self._last_detect = frame_idx
+            return True
+        return False
+
+    def observe(self, frame_idx: int, *centroid_maps):
+        """Records whether any of the {id: (cx, cy)} maps seen at `frame_idx` is near the line."""
+        if not self.adaptive:
+            return
+        near = any(
+            abs(cy - self.stop_line_y) <= self.band
+            for centroids in centroid_maps for _, cy in centroids.values()
+        )
+        with self._cond:
+            self._near_line[frame_idx] = near
+            self._cond.notify_all()
+
+    def close(self):
+        """Releases a decision still waiting for frames that will never be observed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class MotionModel:
+    """
+    Constant-velocity extrapolation of tracked centroids between detections.
+    """
+    def __init__(self):
+        self._last: dict[int, tuple[int, tuple[float, float]]] = {}
+        self._vel: dict[int, tuple[float, float]] = {}
+
+    def update(self, frame_idx: int, tracked: dict):
+        """Records centroids seen on a detected frame; drops vanished ids."""
+        for oid, (cx, cy) in tracked.items():
+            last = self._last.get(oid)
+            if last and frame_idx > last[0]:
+                dt = frame_idx - last[0]
+                self._vel[oid] = ((cx - last[1][0]) / dt, (cy - last[1][1]) / dt)
+            self._last[oid] = (frame_idx, (cx, cy))
+        for oid in set(self._last) - set(tracked):
+            del self._last[oid]
+            self._vel.pop(oid, None)
+
+    def predict(self, frame_idx: int) -> dict:
+        """Returns {id: (cx, cy)} extrapolated to `frame_idx`."""
+        out = {}
+        for oid, (idx, (cx, cy)) in self._last.items():
+            vx, vy = self._vel.get(oid, (0.0, 0.0))
+            dt = frame_idx - idx
+            out[oid] = (int(cx + vx * dt), int(cy + vy * dt))
+        return out
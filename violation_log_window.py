@@ -0,0 +1,205 @@
+# violation_log_window.py
+
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from log_index import LogIndex, SORTABLE
+from violation_sink import VIOLATION_FIELDS
+
+# Constants
+CSV_PATH = 'violations.csv'
+PAGE_SIZE = 100
+towns = ['All','Harare','Bulawayo','Mutare','Gweru','Kadoma','Chinhoyi','Bindura',
+         'Marondera','Norton','Masvingo','Chiredzi','Mutoko','Chipinge','Rusape']
+
+
+class ViolationLogWindow(tk.Toplevel):
+    """
+    Paged violation log backed by the SQLite log index:
+      - Filters: location, plate prefix, date range
+      - Click a sortable column heading to sort; click again to reverse
+      - Prev / Next pages, Export CSV of everything matching the filters
+    Index syncs, queries and exports run on a worker thread; results are
+    picked up on the Tk thread, so the window never blocks.
+    """
+    def __init__(self, master, csv_path: str = CSV_PATH, index: LogIndex | None = None):
+        super().__init__(master)
+        self.title('Violation Logs')
+        self.geometry('1000x560')
+        self.csv_path = csv_path
+        self.index = index or LogIndex()
+        self.page = 0
+        self.total = 0
+        self.sort = 'timestamp'
+        self.descending = True
+        self._results = queue.Queue()
+        self._busy = False
+        self._pending = None      # query asked for while another was running
+        self._pending_export = None  # (path, query) of an export asked for meanwhile
+        self._build_ui()
+        self._run(lambda: self.index.sync(self.csv_path), lambda _: self._query())
+        self.after(50, self._poll)
+
+    def _build_ui(self):
+        ctrl = ttk.Frame(self)
+        ctrl.pack(fill=tk.X, pady=5, padx=10)
+
+        ttk.Label(ctrl, text='Location:').pack(side=tk.LEFT, padx=5)
+        self.loc_var = tk.StringVar(value='All')
+        loc_cb = ttk.Combobox(ctrl, values=towns, state='readonly', width=12, textvariable=self.loc_var)
+        loc_cb.pack(side=tk.LEFT)
+        loc_cb.bind('<<ComboboxSelected>>', lambda e: self._search())
+
+        ttk.Label(ctrl, text='Plate:').pack(side=tk.LEFT, padx=5)
+        self.plate_var = tk.StringVar()
+        plate = ttk.Entry(ctrl, width=10, textvariable=self.plate_var)
+        plate.pack(side=tk.LEFT)
+        plate.bind('<Return>', lambda e: self._search())
+
+        ttk.Label(ctrl, text='Start (YYYY-MM-DD):').pack(side=tk.LEFT, padx=5)
+        self.start_var = tk.StringVar()
+        ttk.Entry(ctrl, width=12, textvariable=self.start_var).pack(side=tk.LEFT)
+
+        ttk.Label(ctrl, text='End (YYYY-MM-DD):').pack(side=tk.LEFT, padx=5)
+        self.end_var = tk.StringVar()
+        ttk.Entry(ctrl, width=12, textvariable=self.end_var).pack(side=tk.LEFT)
+
+        ttk.Button(ctrl, text='Export CSV', command=self._export).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(ctrl, text='Search', command=self._search).pack(side=tk.RIGHT, padx=5)
+
+        table = ttk.Frame(self)
+        table.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.tree = ttk.Treeview(table, columns=VIOLATION_FIELDS, show='headings')
+        for col in VIOLATION_FIELDS:
+            if col in SORTABLE:
+                self.tree.heading(col, text=col, command=lambda c=col: self._sort_by(c))
+            else:
+                self.tree.heading(col, text=col)
+            self.tree.column(col, width=200 if col in ('timestamp', 'snapshot', 'clip') else 100)
+        scroll = ttk.Scrollbar(table, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        nav = ttk.Frame(self)
+        nav.pack(fill=tk.X, pady=5, padx=10)
+        ttk.Button(nav, text='◀ Prev', command=lambda: self._goto(self.page - 1)).pack(side=tk.LEFT)
+        ttk.Button(nav, text='Next ▶', command=lambda: self._goto(self.page + 1)).pack(side=tk.LEFT, padx=5)
+        self.status_var = tk.StringVar(value='Indexing logs…')
+        ttk.Label(nav, textvariable=self.status_var).pack(side=tk.LEFT, padx=10)
+
+    # --- background work -------------------------------------------------
+
+    def _run(self, work, done):
+        """Runs `work()` on a worker thread and `done(result)` back on the Tk thread."""
+        self._busy = True
+
+        def target():
+            try:
+                self._results.put((done, work(), None))
+            except Exception as exc:
+                self._results.put((done, None, exc))
+        threading.Thread(target=target, daemon=True).start()
+
+    def _poll(self):
+        try:
+            while True:
+                done, result, exc = self._results.get_nowait()
+                self._busy = False
+                if exc is not None:
+                    messagebox.showerror('Violation Logs', str(exc), parent=self)
+                else:
+                    done(result)
+                if self._busy:
+                    continue    # done() started more work; the rest waits for it
+                if self._pending_export is not None:
+                    export, self._pending_export = self._pending_export, None
+                    self._start_export(*export)
+                elif self._pending is not None:
+                    count, self._pending = self._pending, None
+                    self._query(count)
+        except queue.Empty:
+            pass
+        if self.winfo_exists():
+            self.after(50, self._poll)
+
+    # --- queries ---------------------------------------------------------
+
+    def _filters(self):
+        loc = self.loc_var.get()
+        return dict(
+            city=None if loc == 'All' else loc,
+            start=self.start_var.get().strip() or None,
+            end=self.end_var.get().strip() or None,
+            plate_prefix=self.plate_var.get().strip() or None,
+        )
+
+    def _search(self):
+        self.page = 0
+        self._query(count=True)
+
+    def _sort_by(self, col):
+        if col == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = col, col == 'timestamp'
+        self.page = 0
+        self._query(count=False)
+
+    def _goto(self, page):
+        pages = max(-(-self.total // PAGE_SIZE), 1)
+        if 0 <= page < pages and page != self.page:
+            self.page = page
+            self._query(count=False)
+
+    def _query(self, count: bool = True):
+        if self._busy:
+            self._pending = count or bool(self._pending)
+            return
+        filters, sort, descending, page = self._filters(), self.sort, self.descending, self.page
+        self.status_var.set('Loading…')
+
+        def work():
+            total = self.index.count(**filters) if count else self.total
+            rows = self.index.page(**filters, sort=sort, descending=descending,
+                                   page=page, page_size=PAGE_SIZE)
+            return total, rows
+        self._run(work, self._show)
+
+    def _show(self, result):
+        self.total, rows = result
+        self.tree.delete(*self.tree.get_children())
+        for rec in rows.itertuples(index=False, name=None):
+            self.tree.insert('', tk.END, values=rec)
+        pages = max(-(-self.total // PAGE_SIZE), 1)
+        arrow = '▼' if self.descending else '▲'
+        for col in SORTABLE:
+            self.tree.heading(col, text=f'{col} {arrow}' if col == self.sort else col)
+        self.status_var.set(f'Page {self.page + 1} of {pages} · {self.total:,} violations')
+
+    def _export(self):
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension='.csv',
+            filetypes=[('CSV File','*.csv')]
+        )
+        if not path:
+            return
+        query = dict(self._filters(), sort=self.sort, descending=self.descending)
+        if self._busy:
+            # runs as soon as the current sync or query is done
+            self._pending_export = (path, query)
+            self.status_var.set('Export queued…')
+            return
+        self._start_export(path, query)
+
+    def _start_export(self, path, query):
+        status = self.status_var.get()
+        self.status_var.set('Exporting…')
+
+        def done(_):
+            self.status_var.set(status)
+            messagebox.showinfo('Export', f'Logs saved to\n{path}', parent=self)
+        self._run(lambda: self.index.export_csv(path, **query), done)
@@ -0,0 +1,160 @@
+# violation_sink.py
+
+import csv
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the per-sink writer thread serialises writes
+    fcntl = None
+
+# Column layouts shared with the dashboards
+VIOLATION_FIELDS = ['timestamp', 'city', 'plate', 'light_color', 'snapshot', 'clip']
+SUMMARY_FIELDS = ['timestamp', 'location', 'cars_passed', 'violations']
+
+
+def _append_locked(f, fieldnames, rows):
+    """
+    Appends `rows` to the open file `f` under an exclusive lock, writing the
+    header first if the file is empty. Rows follow the existing header of a
+    non-empty file, so logs started with fewer columns stay aligned.
+    Safe across threads and processes.
+    """
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        f.seek(0, os.SEEK_END)
+        empty = f.tell() == 0
+        if not empty:
+            with open(f.name, newline='') as r:
+                fieldnames = next(csv.reader(r), None) or fieldnames
+        w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        if empty:
+            w.writeheader()
+        w.writerows(rows)
+        f.flush()
+    finally:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def append_csv(path: str, fieldnames, rows):
+    """One-off locked append of `rows` to the CSV at `path`."""
+    with open(path, 'a', newline='') as f:
+        _append_locked(f, fieldnames, rows)
+
+
+class CsvSink:
+    """
+    Buffered CSV appender. Rows are queued from the caller's thread and
+    written by a single writer thread through one long-lived file handle,
+    flushed every `max_rows` rows or `flush_interval` seconds.
+    `on_flush`, if given, is called on the writer thread with every batch
+    of rows once it is on disk.
+
+    If a write or the hook fails, the writer thread keeps draining the
+    queue, so callers never block on it, and the first error is re-raised
+    from the next `write`, `flush` or `close`.
+    """
+    def __init__(self, path: str, fieldnames=VIOLATION_FIELDS, max_rows: int = 64,
+                 flush_interval: float = 2.0, max_pending: int = 10000, on_flush=None):
+        self.path = path
+        self.on_flush = on_flush
+        self.fieldnames = list(fieldnames)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._file = open(path, 'a', newline='')
+        self._thread = threading.Thread(target=self._run, name=f'csv-sink:{path}', daemon=True)
+        self._thread.start()
+
+    def write(self, row: dict):
+        """Queues one row; blocks only if `max_pending` rows are waiting."""
+        self._raise()
+        self._queue.put(('row', row))
+
+    def flush(self):
+        """Blocks until every row queued so far is on disk."""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        done.wait()
+        self._raise()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(('close', None))
+            self._thread.join()
+        self._file.close()
+        self._raise()
+
+    def _raise(self):
+        if self._error is not None:
+            exc, self._error = self._error, None
+            raise exc
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        buf = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                kind, payload = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                kind, payload = 'tick', None
+
+            if kind == 'row':
+                buf.append(payload)
+            now = time.monotonic()
+            if buf and (kind != 'row' or len(buf) >= self.max_rows or now >= deadline):
+                try:
+                    self._write(buf)
+                except Exception as exc:
+                    # keep the first failure for the caller; later rows are still tried
+                    if self._error is None:
+                        self._error = exc
+                buf = []
+            if not buf:
+                deadline = now + self.flush_interval
+            if kind == 'flush':
+                payload.set()
+            elif kind == 'close':
+                return
+
+    def _write(self, rows):
+        _append_locked(self._file, self.fieldnames, rows)
+        if self.on_flush:
+            try:
+                self.on_flush(rows)
+            except Exception as exc:
+                raise RuntimeError(f'{self.path}: on_flush failed after the rows were written') from exc
+
+
+class SnapshotWriter:
+    """
+    Writes snapshot images on a small thread pool so `cv2.imwrite` stays
+    off the analysis loop. At most `max_pending` images are held in memory.
+    """
+    def __init__(self, workers: int = 2, max_pending: int = 32):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='snapshot')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, path: str, image):
+        self._slots.acquire()
+        fut = self._pool.submit(cv2.imwrite, path, image.copy())
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def close(self):
+        self._pool.shutdown(wait=True)